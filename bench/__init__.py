@@ -0,0 +1,2 @@
+"""Offline benchmarks: a mock Gemini/Mistral API, a synthetic paper corpus
+and a harness that runs the pipeline against them (python -m bench.run_bench)."""
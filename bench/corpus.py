@@ -0,0 +1,135 @@
+# ============================================
+# SYNTHETIC PAPER CORPUS
+# ============================================
+# Generates text PDFs that look enough like papers for the pipeline:
+# title, Abstract, numbered sections and a References list, on as many
+# pages as asked for. The PDF is written by hand (one Helvetica text
+# stream per page), so no PDF library is needed and the output is
+# byte-for-byte reproducible for a given seed.
+#
+#   python -m bench.corpus out/ --pages 5 40 120
+
+import argparse
+import os
+import random
+import textwrap
+
+LINES_PER_PAGE = 55
+LINE_WIDTH = 95
+
+SECTIONS = ["Introduction", "Related Work", "Methodology", "Results", "Discussion", "Conclusion"]
+
+VOCABULARY = (
+    "language learning comprehension students isiZulu Sesotho reading summary academic "
+    "translation corpus model evaluation survey participants results significant effect "
+    "university lecture context multilingual education assessment method analysis data "
+    "findings recall accuracy benchmark baseline approach framework policy access"
+).split()
+
+
+def _sentence(rng):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng):
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+
+
+def paper_lines(pages, seed=0):
+    """Text lines of a paper filling roughly `pages` pages"""
+    rng = random.Random(seed)
+    target = pages * LINES_PER_PAGE
+    references = max(8, target // 12)
+
+    lines = [f"Synthetic Paper {seed}: {_sentence(rng)[:70]}", "", "Abstract"]
+    lines += textwrap.wrap(_paragraph(rng), LINE_WIDTH) + [""]
+
+    body_target = target - references - len(lines)
+    per_section = max(4, body_target // len(SECTIONS))
+    for number, title in enumerate(SECTIONS, 1):
+        lines.append(f"{number}. {title}")
+        section = []
+        while len(section) < per_section - 2:
+            section += textwrap.wrap(_paragraph(rng), LINE_WIDTH) + [""]
+        lines += section[:per_section - 1]
+
+    lines.append("References")
+    for i in range(1, references + 1):
+        lines.append(f"[{i}] Author {i}, A. ({2000 + i % 25}). {_sentence(rng)[:60]} Journal of Studies, {i}(2).")
+    return lines
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_from_lines(lines):
+    """A minimal PDF (one text stream per page, Helvetica) as bytes"""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    objects = {}
+    page_ids = []
+    next_id = 4
+    for page in pages:
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        stream = "BT /F1 10 Tf 12 TL 50 800 Td\n" + "".join(f"({_escape(line)}) Tj T*\n" for line in page) + "ET"
+        stream = stream.encode("latin-1", "replace")
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode("ascii")
+    objects[2] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+
+    xref = len(out)
+    count = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % count
+    for number in range(1, count):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref)
+    return bytes(out)
+
+
+def make_paper(pages, seed=0):
+    """PDF bytes of a synthetic paper with about `pages` pages"""
+    return pdf_from_lines(paper_lines(pages, seed))
+
+
+def write_corpus(out_dir, page_counts, seed=0):
+    """Write one paper per page count; returns the file paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, pages in enumerate(page_counts):
+        path = os.path.join(out_dir, f"paper_{pages:04d}p.pdf")
+        with open(path, "wb") as f:
+            f.write(make_paper(pages, seed + i))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic paper PDFs for benchmarking.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 60])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for path in write_corpus(args.out_dir, args.pages, args.seed):
+        print(f"{path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
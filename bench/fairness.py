@@ -0,0 +1,114 @@
+# ============================================
+# FAIRNESS ON A SHARED API KEY
+# ============================================
+# Several sessions share one key against the mock API, which (like the
+# real providers) answers 429 once too many requests for a key are in
+# flight:
+#   - "heavy" fires off a long paper's worth of chunk calls at once
+#   - a few "light" sessions each send one normal request just after
+#   - "short" sends one short ("Abstract only") request, which goes in the
+#     priority lane
+#
+# Reports latency per session, the queue positions they were shown and the
+# mock's 429 count. Compare with the scheduler turned off:
+#
+#   python -m bench.fairness --heavy 20 --light 3 --max-concurrent 2
+#   python -m bench.fairness --heavy 20 --light 3 --max-concurrent 2 --no-scheduler
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from . import mock_server
+from .run_bench import _configure_environment
+
+PAPER_TEXT = "The study finds that students recall more of what they read in their home language. " * 40
+
+
+def _run_session(provider, session, priority, start_delay, calls, results):
+    from zalingo import providers, scheduler
+
+    call = providers.call_gemini_rest_api if provider == "gemini" else providers.call_mistral_api
+    shown = []
+
+    def one_call():
+        started = time.perf_counter()
+        with scheduler.requester(session, priority=priority, on_wait=lambda pos, eta: shown.append(pos)):
+            ok = bool(call("bench-shared-key", "Summarize this part.", PAPER_TEXT, notify=lambda *a: None))
+        results.append((session, time.perf_counter() - started, ok))
+
+    time.sleep(start_delay)
+    threads = [threading.Thread(target=one_call) for _ in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    positions = [p for p in shown if p is not None]
+    results.append((session, "max_position", max(positions) if positions else 0))
+
+
+def run(args):
+    sessions = [("heavy", False, 0.0, args.heavy)]
+    sessions += [(f"light-{i}", False, 0.05, 1) for i in range(1, args.light + 1)]
+    sessions.append(("short", True, 0.05, 1))
+
+    results = []
+    threads = [
+        threading.Thread(target=_run_session, args=(args.provider, *session, results))
+        for session in sessions
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def print_report(results, total, stats):
+    print(f"\n{'session':<10}{'calls':>6}{'failed':>8}{'median s':>10}{'max s':>8}{'max queue pos':>15}")
+    names = sorted({r[0] for r in results}, key=lambda s: (s != "heavy", s))
+    for name in names:
+        latencies = [r[1] for r in results if r[0] == name and r[1] != "max_position"]
+        failed = sum(1 for r in results if r[0] == name and r[1] != "max_position" and not r[2])
+        position = next(r[2] for r in results if r[0] == name and r[1] == "max_position")
+        print(f"{name:<10}{len(latencies):>6}{failed:>8}{statistics.median(latencies):>10.2f}"
+              f"{max(latencies):>8.2f}{position:>15}")
+    print(f"\nWall time: {total:.2f}s")
+    print(f"Mock API requests: {stats}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how fairly sessions sharing one API key are served.")
+    parser.add_argument("--provider", choices=["gemini", "mistral"], default="gemini")
+    parser.add_argument("--heavy", type=int, default=20, help="Calls fired at once by the heavy session")
+    parser.add_argument("--light", type=int, default=3, help="Sessions sending one normal request each")
+    parser.add_argument("--no-scheduler", action="store_true", help="Turn the per-key scheduler off")
+    parser.add_argument("--key-concurrency", type=int, default=None,
+                        help="Calls in flight per key (default: --max-concurrent, or the app's setting)")
+    mock_server.add_arguments(parser)
+    parser.set_defaults(latency=0.5, max_concurrent=2, retry_after=0.5)
+    args = parser.parse_args(argv)
+
+    server, base_url, stats = mock_server.start(mock_server.config_from_args(args))
+    work_dir = tempfile.mkdtemp(prefix="zalingo-fairness-")
+    _configure_environment(base_url, os.path.join(work_dir, "cache"), None)
+    if args.no_scheduler:
+        os.environ["ZALINGO_KEY_CONCURRENCY"] = "0"
+    elif args.key_concurrency or args.max_concurrent:
+        os.environ["ZALINGO_KEY_CONCURRENCY"] = str(args.key_concurrency or args.max_concurrent)
+
+    try:
+        results, total = run(args)
+        print_report(results, total, stats.snapshot())
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+# ============================================
+# LOCAL STAND-IN FOR GEMINI AND MISTRAL
+# ============================================
+# A small HTTP server that speaks just enough of both APIs for the
+# pipeline to run offline:
+#   POST /{version}/models/{model}:generateContent
+#   POST /{version}/models/{model}:streamGenerateContent?alt=sse
+#   POST /v1/chat/completions                 (with or without "stream")
+#
+# Replies are canned text with plausible token usage. Latency, error rate,
+# 429s, a per-key concurrency limit and unavailable (404) models are
+# configurable, so retries, hedging, fallbacks and the per-key scheduler
+# can be exercised without spending quota.
+#
+#   python -m bench.mock_server --port 8765 --latency 0.3 --error-rate 0.1 \
+#       --missing-model gemini-2.5-flash
+#
+# then run the app with
+#   ZALINGO_GEMINI_BASE_URL=http://127.0.0.1:8765 \
+#   ZALINGO_MISTRAL_BASE_URL=http://127.0.0.1:8765 ZALINGO_GEMINI_SDK=0 \
+#   streamlit run app.py
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+GEMINI_PATH = re.compile(r"^/(v1|v1beta)/models/([^/:]+):(generateContent|streamGenerateContent)$")
+MISTRAL_PATH = "/v1/chat/completions"
+
+WORDS = (
+    "the study finds that students who read summaries in their home language "
+    "recall more of the key findings and report higher confidence while the "
+    "methodology combines surveys interviews and a controlled reading task"
+).split()
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.05           # seconds before the response headers
+    jitter: float = 0.0             # extra uniform random latency, up to this
+    error_rate: float = 0.0         # share of requests answered with a 500
+    rate_limit_rate: float = 0.0    # share of requests answered with a 429
+    retry_after: float = 1.0        # Retry-After sent with every 429
+    missing_models: set = field(default_factory=set)   # answered with a 404
+    max_concurrent: int = 0         # requests in flight per API key before 429s (0 = no limit)
+    reply_words: int = 150
+    tokens_per_second: float = 400  # streaming speed
+    seed: int = None
+
+
+class MockStats:
+    """Request counts by (api, status), readable while the server runs"""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, api, status):
+        with self.lock:
+            self.counts[(api, status)] = self.counts.get((api, status), 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {f"{api} {status}": n for (api, status), n in sorted(self.counts.items())}
+
+
+def _reply(config, rng):
+    words = [rng.choice(WORDS) for _ in range(config.reply_words)]
+    return " ".join(words).capitalize() + "."
+
+
+def _pieces(text, size=8):
+    words = text.split(" ")
+    for i in range(0, len(words), size):
+        yield " ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+    stats = MockStats()
+    rng = random.Random()
+    in_flight = {}
+    in_flight_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------- plumbing ----------
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return {}
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_events(self, events):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = 8 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+        for event in events:
+            data = f"data: {event if isinstance(event, str) else json.dumps(event)}\r\n\r\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _fault(self, api, model):
+        """Send an error response if this request should fail; True if sent"""
+        config = self.config
+        time.sleep(config.latency + self.rng.uniform(0, config.jitter))
+        if model in config.missing_models:
+            status, headers = 404, {}
+        elif self.rng.random() < config.rate_limit_rate:
+            status, headers = 429, {"Retry-After": f"{config.retry_after:g}"}
+        elif self.rng.random() < config.error_rate:
+            status, headers = 500, {}
+        else:
+            return False
+        self.stats.add(api, status)
+        self._send_json(status, {"error": {"code": status, "message": "mock failure"}}, headers)
+        return True
+
+    # ---------- routes ----------
+
+    def _api_key(self):
+        query = parse_qs(urlsplit(self.path).query)
+        return query.get("key", [None])[0] or self.headers.get("Authorization", "")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        request = self._read_json()
+        match = GEMINI_PATH.match(path)
+        api = "gemini" if match else "mistral" if path == MISTRAL_PATH else "unknown"
+
+        key = self._api_key()
+        with self.in_flight_lock:
+            self.in_flight[key] = self.in_flight.get(key, 0) + 1
+            over_limit = 0 < self.config.max_concurrent < self.in_flight[key]
+        try:
+            if over_limit:
+                self.stats.add(api, 429)
+                self._send_json(429, {"error": {"code": 429, "message": "mock: too many concurrent requests"}},
+                                {"Retry-After": f"{self.config.retry_after:g}"})
+            elif match:
+                self._gemini(match.group(2), match.group(3) == "streamGenerateContent", request)
+            elif api == "mistral":
+                self._mistral(request)
+            else:
+                self.stats.add("unknown", 404)
+                self._send_json(404, {"error": {"code": 404, "message": f"no route for {path}"}})
+        finally:
+            with self.in_flight_lock:
+                self.in_flight[key] -= 1
+
+    def _gemini(self, model, stream, request):
+        if self._fault("gemini", model):
+            return
+        self.stats.add("gemini", 200)
+        prompt = "".join(
+            part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", [])
+        )
+        text = _reply(self.config, self.rng)
+        usage = {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4}
+
+        if not stream:
+            self._send_json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+                "usageMetadata": usage,
+            })
+            return
+        events = [{"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}}]}
+                  for piece in _pieces(text)]
+        events[-1]["usageMetadata"] = usage
+        self._send_events(events)
+
+    def _mistral(self, request):
+        model = request.get("model", "")
+        if self._fault("mistral", model):
+            return
+        self.stats.add("mistral", 200)
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        text = _reply(self.config, self.rng)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            })
+            return
+        events = [{"choices": [{"index": 0, "delta": {"content": piece}}]} for piece in _pieces(text)]
+        events[-1]["usage"] = usage
+        self._send_events(events + ["[DONE]"])
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up (cancelled hedges, abandoned streams) are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start(config=None, host="127.0.0.1", port=0):
+    """Serve in a background thread; returns (server, base_url, stats)"""
+    config = config or MockConfig()
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "config": config,
+        "stats": MockStats(),
+        "rng": random.Random(config.seed),
+        "in_flight": {},
+        "in_flight_lock": threading.Lock(),
+    })
+    server = MockServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}", handler.stats
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests failing with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--missing-model", action="append", default=[],
+                        help="Model name answered with 404 (repeatable)")
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="Requests in flight per API key before answering 429 (0 = no limit)")
+    parser.add_argument("--reply-words", type=int, default=150)
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        missing_models=set(args.missing_model),
+        max_concurrent=args.max_concurrent,
+        reply_words=args.reply_words,
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini and Mistral APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server, url, stats = start(config_from_args(args), args.host, args.port)
+    print(f"Mock Gemini/Mistral API on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(stats.snapshot())
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# ============================================
+# OFFLINE BENCHMARK
+# ============================================
+# Runs the real summarization pipeline (the same job body the app uses)
+# against the local mock API over a generated corpus, and reports per
+# paper:
+#   - extraction throughput (pages/sec, timed on its own after a warm-up
+#     extraction), its peak Python memory in this process and the peak RSS
+#     of the extraction worker processes
+#   - end-to-end latency per run, time to first token, cache hit
+#   - provider calls and tokens, from the pipeline's own metrics trace
+#
+# Run 1 of every paper starts from an empty cache; later runs show what
+# the caches save (use --no-cache to force fresh summaries every time).
+# Results can be saved as JSON and compared against an earlier run:
+#
+#   python -m bench.run_bench --pages 5 40 120 --runs 2 --json new.json
+#   python -m bench.run_bench --pages 5 40 120 --compare new.json
+#
+# Nothing leaves the machine: the app's API base URLs are pointed at the
+# mock server and the Gemini SDK (which can't be redirected) is skipped.
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from . import corpus, mock_server
+
+
+def _configure_environment(base_url, cache_dir, hedge_delay):
+    """Must run before zalingo is imported: its settings are read at import"""
+    os.environ["ZALINGO_GEMINI_BASE_URL"] = base_url
+    os.environ["ZALINGO_MISTRAL_BASE_URL"] = base_url
+    os.environ["ZALINGO_GEMINI_SDK"] = "0"
+    os.environ["ZALINGO_CACHE_DIR"] = cache_dir
+    os.environ["ZALINGO_METRICS"] = "0"
+    if hedge_delay is not None:
+        os.environ["ZALINGO_HEDGE_DELAY"] = str(hedge_delay)
+    # The free-tier limits would make the benchmark measure our own throttling
+    os.environ.setdefault("ZALINGO_GEMINI_RPM", "100000")
+    os.environ.setdefault("ZALINGO_MISTRAL_RPM", "100000")
+
+
+def _measure(fn, *args):
+    """(result, seconds, peak traced MB) for fn(*args)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn(*args)
+    finally:
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, seconds, peak / (1024 * 1024)
+
+
+def _worker_pids():
+    """Pids of the extraction pool's worker processes"""
+    from zalingo import extraction
+    return [pid for pool in list(extraction._pools.values()) for pid in list(pool._processes or {})]
+
+
+def _reset_peak_rss(pids):
+    # Writing 5 to clear_refs resets the VmHWM high-water mark (Linux)
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+
+
+def _peak_rss_mb(pids):
+    """Largest VmHWM of `pids` in MB, or None where /proc isn't available"""
+    peaks = []
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                peaks += [int(line.split()[1]) / 1024 for line in f if line.startswith("VmHWM:")]
+        except OSError:
+            pass
+    return round(max(peaks), 1) if peaks else None
+
+
+def warm_up():
+    """Extract a paper big enough for the process pool, so that library
+    imports and worker start-up aren't timed as part of the first paper"""
+    from zalingo import settings
+    from zalingo.pipeline import extract_text_from_pdf
+
+    extract_text_from_pdf(corpus.make_paper(settings.PARALLEL_MIN_PAGES))
+
+
+def bench_paper(path, args):
+    from zalingo import settings
+    from zalingo.jobs import Job
+    from zalingo.pipeline import SummaryRequest, extract_text_from_pdf, run_summary_request
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # Throughput without tracemalloc's overhead, then memory in a second pass
+    _reset_peak_rss(_worker_pids())
+    started = time.perf_counter()
+    doc = extract_text_from_pdf(data)
+    extract_seconds = time.perf_counter() - started
+    in_pool = len(doc.pages) >= settings.PARALLEL_MIN_PAGES and settings.EXTRACTION_WORKERS >= 2
+    worker_peak = _peak_rss_mb(_worker_pids()) if in_pool else None
+    _, _, extract_peak = _measure(extract_text_from_pdf, data)
+
+    pages = len(doc.pages)
+    row = {
+        "paper": os.path.basename(path),
+        "pages": pages,
+        "kb": round(len(data) / 1024, 1),
+        "extract_seconds": round(extract_seconds, 4),
+        "pages_per_second": round(pages / extract_seconds, 1) if extract_seconds else None,
+        "extract_peak_mb": round(extract_peak, 2),
+        "worker_peak_mb": worker_peak,
+        "runs": [],
+    }
+
+    for run in range(args.runs):
+        request = SummaryRequest(
+            api_key="bench-key",
+            provider=args.provider,
+            summary_type=args.summary_type,
+            summary_length="Medium",
+            language=args.language,
+            pdf_bytes=data,
+            force_refresh=args.no_cache,
+            stream=True,
+        )
+        job = Job(id=f"bench-{run}")
+        result, seconds, peak = _measure(run_summary_request, job, request)
+        trace = result["trace"]
+        tokens_in, tokens_out = trace.tokens()
+        llm = trace.stage_totals().get("llm_call", (0, 0.0))
+        row["runs"].append({
+            "seconds": round(seconds, 4),
+            "first_token": round(result["first_token"], 4) if result["first_token"] is not None else None,
+            "cache_hit": result["cache_hit"],
+            "ok": bool(result["summary"]),
+            "llm_calls": llm[0],
+            "llm_seconds": round(llm[1], 4),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "retries": trace.counters.get("http_retries", 0),
+            "peak_mb": round(peak, 2),
+        })
+    return row
+
+
+def print_report(rows, stats):
+    print(f"\n{'paper':<20}{'pages':>6}{'KB':>8}{'extract s':>11}{'pages/s':>9}{'peak MB':>9}{'worker MB':>11}")
+    for row in rows:
+        print(f"{row['paper']:<20}{row['pages']:>6}{row['kb']:>8}{row['extract_seconds']:>11}"
+              f"{row['pages_per_second'] or '-':>9}{row['extract_peak_mb']:>9}{row['worker_peak_mb'] or '-':>11}")
+
+    print(f"\n{'paper':<20}{'run':>4}{'e2e s':>9}{'1st tok':>9}{'cache':>7}{'calls':>7}"
+          f"{'tok in':>9}{'tok out':>9}{'retry':>7}{'peak MB':>9}")
+    for row in rows:
+        for i, run in enumerate(row["runs"], 1):
+            first = "-" if run["first_token"] is None else run["first_token"]
+            print(f"{row['paper']:<20}{i:>4}{run['seconds']:>9}{first:>9}{'hit' if run['cache_hit'] else 'miss':>7}"
+                  f"{run['llm_calls']:>7}{run['tokens_in']:>9}{run['tokens_out']:>9}{run['retries']:>7}"
+                  f"{run['peak_mb']:>9}{'' if run['ok'] else '  FAILED'}")
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    workers = [row["worker_peak_mb"] for row in rows if row["worker_peak_mb"]]
+    print(f"\nMax RSS: {usage:.0f} MB (extraction workers: {f'{max(workers):.0f} MB' if workers else 'not used'})")
+    print("peak MB is Python memory in this process; worker MB is the peak RSS of each extraction worker")
+    print(f"Mock API requests: {stats}")
+
+
+def summarize_rows(rows):
+    """Per-paper numbers used for comparisons: cold e2e, warm e2e, pages/sec"""
+    summary = {}
+    for row in rows:
+        cold = row["runs"][0]["seconds"] if row["runs"] else None
+        warm = [r["seconds"] for r in row["runs"][1:]]
+        summary[row["paper"]] = {
+            "cold_seconds": cold,
+            "warm_seconds": statistics.median(warm) if warm else None,
+            "pages_per_second": row["pages_per_second"],
+        }
+    return summary
+
+
+def compare(current, baseline, max_regression):
+    """Print changes against a baseline summary; returns True if within bounds"""
+    ok = True
+    print(f"\nCompared with baseline (max regression {max_regression:.0%}):")
+    for paper, now in current.items():
+        before = baseline.get(paper)
+        if not before:
+            continue
+        for metric, higher_is_better in (("cold_seconds", False), ("warm_seconds", False), ("pages_per_second", True)):
+            if not now.get(metric) or not before.get(metric):
+                continue
+            change = now[metric] / before[metric] - 1
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > max_regression:
+                flag = "  <-- REGRESSION"
+                ok = False
+            print(f"  {paper:<20}{metric:<18}{before[metric]:>10} -> {now[metric]:<10}{change:+.1%}{flag}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the summarization pipeline offline.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20, 60], help="Corpus paper sizes")
+    parser.add_argument("--corpus", help="Directory of PDFs to use instead of generated papers")
+    parser.add_argument("--runs", type=int, default=2, help="Summary runs per paper")
+    parser.add_argument("--provider", choices=["gemini", "mistral"], default="gemini")
+    parser.add_argument("--summary-type", default="Full paper summary")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--no-cache", action="store_true", help="Force a fresh summary on every run")
+    parser.add_argument("--hedge-delay", type=float, default=None)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    mock_server.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server, base_url, stats = mock_server.start(mock_server.config_from_args(args))
+    work_dir = tempfile.mkdtemp(prefix="zalingo-bench-")
+    _configure_environment(base_url, os.path.join(work_dir, "cache"), args.hedge_delay)
+
+    if args.corpus:
+        paths = sorted(
+            os.path.join(args.corpus, name) for name in os.listdir(args.corpus) if name.lower().endswith(".pdf")
+        )
+    else:
+        paths = corpus.write_corpus(os.path.join(work_dir, "corpus"), args.pages)
+
+    print(f"Mock API on {base_url}, {len(paths)} paper(s), {args.runs} run(s) each, work dir {work_dir}")
+    try:
+        warm_up()
+        rows = [bench_paper(path, args) for path in paths]
+    finally:
+        server.shutdown()
+
+    print_report(rows, stats.snapshot())
+    results = {
+        "created_at": time.time(),
+        "argv": sys.argv[1:] if argv is None else argv,
+        "summary": summarize_rows(rows),
+        "papers": rows,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(results["summary"], baseline.get("summary", {}), args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# ============================================
+# STARTUP AND RERUN TIMING
+# ============================================
+# Measures what a Streamlit worker pays before it can show the page:
+#   - importing the modules app.py imports, in a fresh interpreter, and
+#     which heavy libraries that drags in (should be none of them)
+#   - with Streamlit installed, the app's first script run in a fresh
+#     process (cold start) and the reruns after it, using Streamlit's
+#     AppTest harness - a rerun that does no work should cost next to
+#     nothing
+#
+#   python -m bench.startup --repeat 5 --reruns 20
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_IMPORTS = "import zalingo.jobs, zalingo.pipeline, zalingo.prompts, zalingo.metrics, zalingo.ocr, zalingo.resources"
+
+HEAVY_MODULES = ["google.generativeai", "pdfplumber", "PyPDF2", "deep_translator", "requests", "pypdfium2", "pytesseract"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+{APP_IMPORTS}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+APP_PROBE = """
+import json, statistics, sys, time
+from streamlit.testing.v1 import AppTest
+
+started = time.perf_counter()
+app = AppTest.from_file({app!r}, default_timeout=60)
+app.run()
+cold = time.perf_counter() - started
+
+reruns = []
+for _ in range({reruns}):
+    started = time.perf_counter()
+    app.run()
+    reruns.append(time.perf_counter() - started)
+print(json.dumps({{"cold": cold, "reruns": reruns, "exceptions": [str(e.value) for e in app.exception]}}))
+"""
+
+
+def _run_probe(code, env):
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(repeat, env):
+    runs = [_run_probe(IMPORT_PROBE, env) for _ in range(repeat)]
+    return {
+        "import_seconds": statistics.median(r["seconds"] for r in runs),
+        "heavy_modules_loaded": runs[-1]["loaded"],
+    }
+
+
+def measure_app(app_path, reruns, env):
+    result = _run_probe(APP_PROBE.format(app=app_path, reruns=reruns), env)
+    return {
+        "cold_start_seconds": result["cold"],
+        "rerun_median_seconds": statistics.median(result["reruns"]) if result["reruns"] else None,
+        "rerun_max_seconds": max(result["reruns"]) if result["reruns"] else None,
+        "exceptions": result["exceptions"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the app's import, cold start and rerun times.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters for the import timing")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns timed after the cold start")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py"))
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, ZALINGO_METRICS="0")
+    results = measure_imports(args.repeat, env)
+    print(f"Import of the app's modules: {results['import_seconds'] * 1000:.0f} ms (median of {args.repeat})")
+    print(f"Heavy modules loaded at import: {', '.join(results['heavy_modules_loaded']) or 'none'}")
+
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        print("Streamlit isn't installed: skipping the cold start and rerun timing")
+    else:
+        results.update(measure_app(args.app, args.reruns, env))
+        print(f"Cold start (first script run): {results['cold_start_seconds'] * 1000:.0f} ms")
+        if results["rerun_median_seconds"] is not None:
+            print(f"Rerun: {results['rerun_median_seconds'] * 1000:.1f} ms median, "
+                  f"{results['rerun_max_seconds'] * 1000:.1f} ms max ({args.reruns} reruns)")
+        for message in results["exceptions"]:
+            print(f"App raised: {message}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from zalingo.jobs import JobQueue
+
+
+def _wait(queue, job_id):
+    job = queue.get(job_id)
+    for _ in range(500):
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_without_summary_is_not_reused():
+    queue = JobQueue(workers=1)
+    runs = []
+
+    def no_summary(job):
+        runs.append(job.id)
+        return {"summary": None, "summaries": None}
+
+    first = queue.submit(no_summary, key="paper|settings")
+    assert _wait(queue, first).status == "done"
+
+    second = queue.submit(no_summary, key="paper|settings")
+    assert second != first
+    _wait(queue, second)
+    assert runs == [first, second]
+
+
+def test_job_with_summary_is_reused():
+    queue = JobQueue(workers=1)
+    first = queue.submit(lambda job: {"summary": "A summary."}, key="paper|settings")
+    _wait(queue, first)
+    assert queue.submit(lambda job: {"summary": "Again."}, key="paper|settings") == first
+
+
+def test_running_job_is_reused():
+    queue = JobQueue(workers=1)
+    release = threading.Event()
+    first = queue.submit(lambda job: release.wait(5) and {"summary": None}, key="paper|settings")
+    try:
+        assert queue.submit(lambda job: None, key="paper|settings") == first
+    finally:
+        release.set()
+    _wait(queue, first)
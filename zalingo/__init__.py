@@ -0,0 +1,7 @@
+"""Support modules for the ZaLingo Academic Streamlit app.
+
+Anything that has to outlive a single Streamlit script run (caches,
+connection pools, background work) lives here: imported modules stay in
+``sys.modules`` between reruns, while ``app.py`` is re-executed from
+scratch on every widget interaction.
+"""
@@ -0,0 +1,303 @@
+# ============================================
+# BATCH SUMMARIZATION
+# ============================================
+# Many papers in, one summary per paper and language out. Used by the
+# "Batch" tab (as a background job, see run_batch_job) and headlessly:
+#
+#     python -m zalingo.batch readings/ extra.zip --out summaries \
+#         --languages isiZulu "Sesotho (Southern Sotho)" --provider gemini
+#
+# Identical files are summarized once. Papers are extracted concurrently
+# on the extraction process pool, and provider calls run on a thread pool
+# that shares the per-key rate limit in transport.py. Progress is recorded
+# in <out>/manifest.json after every summary, so re-running the same
+# command after a crash only does the work that is missing. Finished
+# summaries are collected in <out>/summaries.zip.
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import metrics, scheduler, settings
+from .doc_index import build_index
+from .extraction import extract_async
+from .jsonfile import load_json, save_json
+from .pipeline import summarize_document
+from .prompts import language_codes, summary_prompts, length_map
+from .providers import log_notify
+from .summary_cache import file_digest, get_document, put_document
+
+
+# ============================================
+# INPUTS
+# ============================================
+
+def expand_sources(named_files):
+    """Turn [(name, bytes)] of PDFs and zips into [(name, pdf_bytes)]"""
+    sources = []
+    for name, data in named_files:
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for member in sorted(archive.namelist()):
+                    if member.lower().endswith(".pdf") and not member.startswith("__MACOSX/"):
+                        sources.append((os.path.basename(member), archive.read(member)))
+        elif name.lower().endswith(".pdf"):
+            sources.append((os.path.basename(name), data))
+    return sources
+
+
+def collect_paths(paths):
+    """Read PDFs from files, folders (recursively) and zip archives"""
+    named_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in sorted(files):
+                    if filename.lower().endswith((".pdf", ".zip")):
+                        named_files.append(os.path.join(root, filename))
+        else:
+            named_files.append(path)
+
+    loaded = []
+    for filename in named_files:
+        with open(filename, "rb") as f:
+            loaded.append((filename, f.read()))
+    return expand_sources(loaded)
+
+
+def batch_dir(sources, provider, summary_type, summary_length):
+    """Stable output folder for a set of papers and settings (enables resume)"""
+    digests = sorted({file_digest(data) for _, data in sources})
+    blob = "\n".join(digests + [provider, summary_type, summary_length])
+    job_id = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+    return settings.cache_path(os.path.join("batches", job_id))
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+def _output_name(stem, code):
+    return f"{stem}__{code}.txt"
+
+
+def _unique_stem(name, digest, taken):
+    stem = os.path.splitext(name)[0] or "paper"
+    if stem in taken and taken[stem] != digest:
+        stem = f"{stem}-{digest[:8]}"
+    taken[stem] = digest
+    return stem
+
+
+def _load_document(data):
+    """(DocumentIndex or None, Future or None): cached text first, else extract"""
+    pages = get_document(file_digest(data))
+    if pages is not None:
+        return build_index(pages), None
+    return None, extract_async(data)
+
+
+def run_batch(sources, out_dir, api_key, provider, languages, summary_type, summary_length,
+              on_progress=None, notify=log_notify, concurrency=None):
+    """Summarize every paper in `sources` ([(name, pdf_bytes)]) into every language.
+
+    `on_progress(done, total, message)` is called from the calling thread
+    after each summary. Returns a dict with counts, the duplicate file
+    names that were skipped and the path of the summaries zip.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    manifest = load_json(manifest_path, {})
+    manifest.setdefault("papers", {})
+    manifest["settings"] = {
+        "provider": provider,
+        "summary_type": summary_type,
+        "summary_length": summary_length,
+    }
+    manifest_lock = threading.Lock()
+
+    # Deduplicate identical files
+    papers, duplicates = {}, []
+    taken = {entry["stem"]: digest for digest, entry in manifest["papers"].items()}
+    for name, data in sources:
+        digest = file_digest(data)
+        if digest in papers:
+            duplicates.append(name)
+            continue
+        papers[digest] = (name, data)
+        entry = manifest["papers"].setdefault(digest, {"name": name, "summaries": {}})
+        if "stem" not in entry:
+            entry["stem"] = _unique_stem(name, digest, taken)
+
+    def is_done(digest, language):
+        filename = manifest["papers"][digest]["summaries"].get(language)
+        return filename and os.path.exists(os.path.join(out_dir, filename))
+
+    pending = {d: [l for l in languages if not is_done(d, l)] for d in papers}
+    total = len(papers) * len(languages)
+    done = total - sum(len(langs) for langs in pending.values())
+    failed = 0
+    save_json(manifest_path, manifest)
+    if on_progress:
+        on_progress(done, total, f"{done}/{total} summaries already done")
+
+    def summarize(digest, doc, language):
+        # Batch runs yield to interactive sessions on a shared key
+        with metrics.tracing("batch"), scheduler.requester(f"batch:{out_dir}", weight=settings.BATCH_WEIGHT):
+            summary, _, _ = summarize_document(
+                doc, api_key, provider, summary_type, summary_length, language, notify=notify
+            )
+        if not summary:
+            return False
+        filename = _output_name(manifest["papers"][digest]["stem"], language_codes[language])
+        with open(os.path.join(out_dir, filename), "w", encoding="utf-8") as f:
+            f.write(summary)
+        with manifest_lock:
+            manifest["papers"][digest]["summaries"][language] = filename
+            save_json(manifest_path, manifest)
+        return True
+
+    with ThreadPoolExecutor(max_workers=concurrency or settings.BATCH_CONCURRENCY) as pool:
+        in_flight = {}
+
+        def schedule(digest, doc):
+            if len(doc.text) < 100:
+                return False
+            for language in pending[digest]:
+                in_flight[pool.submit(summarize, digest, doc, language)] = ("summary", digest, language)
+            return True
+
+        for digest, languages_left in pending.items():
+            if not languages_left:
+                continue
+            doc, future = _load_document(papers[digest][1])
+            if future is not None:
+                in_flight[future] = ("extract", digest, None)
+            elif not schedule(digest, doc):
+                failed += len(languages_left)
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                kind, digest, language = in_flight.pop(future)
+                name = papers[digest][0]
+
+                if kind == "extract":
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        results = None
+                        notify("error", f"Could not read {name}: {e}")
+                    doc = build_index([r.text for r in results]) if results else None
+                    if doc and len(doc.text) >= 100:
+                        put_document(file_digest(papers[digest][1]), doc.pages)
+                    if not doc or not schedule(digest, doc):
+                        failed += len(pending[digest])
+                        if on_progress:
+                            on_progress(done, total, f"⚠️ {name}: not enough text extracted")
+                    continue
+
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    ok = False
+                    notify("error", f"{name} ({language}): {e}")
+                if ok:
+                    done += 1
+                else:
+                    failed += 1
+                if on_progress:
+                    status = "✅" if ok else "❌"
+                    on_progress(done, total, f"{status} {name} ({language})")
+
+    return {
+        "done": done,
+        "failed": failed,
+        "total": total,
+        "duplicates": duplicates,
+        "zip_path": write_zip(out_dir, manifest),
+    }
+
+
+def run_batch_job(job, sources, out_dir, api_key, provider, languages, summary_type, summary_length):
+    """Job body for the Batch tab: run_batch, reporting progress on the Job"""
+    job.set_stage("📦 Reading the papers...")
+    return run_batch(
+        sources, out_dir, api_key, provider, languages, summary_type, summary_length,
+        on_progress=job.set_progress, notify=job.notify
+    )
+
+
+def write_zip(out_dir, manifest=None):
+    """Bundle every finished summary into <out_dir>/summaries.zip"""
+    manifest = manifest or load_json(os.path.join(out_dir, "manifest.json"), {"papers": {}})
+    zip_path = os.path.join(out_dir, "summaries.zip")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for entry in manifest["papers"].values():
+            for filename in entry["summaries"].values():
+                path = os.path.join(out_dir, filename)
+                if os.path.exists(path):
+                    archive.write(path, filename)
+    return zip_path
+
+
+# ============================================
+# COMMAND LINE
+# ============================================
+
+def _language_name(value):
+    for name, code in language_codes.items():
+        if value in (name, code):
+            return name
+    raise argparse.ArgumentTypeError(f"unknown language: {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m zalingo.batch",
+        description="Summarize a folder or zip of PDFs into South African languages."
+    )
+    parser.add_argument("inputs", nargs="+", help="PDF files, folders of PDFs, or .zip archives")
+    parser.add_argument("--out", required=True, help="output folder (re-use it to resume)")
+    parser.add_argument("--provider", choices=["gemini", "mistral"], default="gemini")
+    parser.add_argument("--api-key", default=os.environ.get("ZALINGO_API_KEY"),
+                        help="defaults to $ZALINGO_API_KEY")
+    parser.add_argument("--languages", nargs="+", type=_language_name, default=["English"],
+                        help="language names or codes, e.g. isiZulu st")
+    parser.add_argument("--summary-type", choices=list(summary_prompts), default="Full paper summary")
+    parser.add_argument("--length", choices=list(length_map), default="Medium")
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or $ZALINGO_API_KEY)")
+
+    sources = collect_paths(args.inputs)
+    if not sources:
+        parser.error("no PDFs found in the given inputs")
+
+    def report(done, total, message):
+        print(f"[{done}/{total}] {message}", flush=True)
+
+    def notify(level, message):
+        if level in ("warning", "error"):
+            print(f"  {level}: {message}", file=sys.stderr, flush=True)
+
+    result = run_batch(
+        sources, args.out, args.api_key, args.provider, args.languages,
+        args.summary_type, args.length,
+        on_progress=report, notify=notify, concurrency=args.concurrency
+    )
+    if result["duplicates"]:
+        print(f"Skipped {len(result['duplicates'])} duplicate file(s): {', '.join(result['duplicates'])}")
+    print(f"Done: {result['done']}/{result['total']} summaries, {result['failed']} failed -> {result['zip_path']}")
+    return 0 if result["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
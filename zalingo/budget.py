@@ -0,0 +1,304 @@
+# ============================================
+# TOKEN BUDGETS FOR PROVIDER CALLS
+# ============================================
+# Instead of cutting the paper text at a fixed number of characters, every
+# provider call is packed to the input budget of the model it goes to:
+#
+#   input budget = min(context window - output reservation, MAX_INPUT_TOKENS)
+#
+# Tokens are estimated per word rather than per character, and text that
+# doesn't read like English costs more: isiZulu, isiXhosa and the other
+# agglutinative languages have long words that split into several tokens,
+# so "4 characters per token" only holds for English. The estimate is
+# corrected per model with the input token counts the providers report.
+#
+# A text that doesn't fit is packed by value rather than cut off: the
+# opening (title and abstract) and every section heading first, then
+# results and conclusions, discussion, introduction and methods, and the
+# rest last. Within a group the sections share the room, each from its
+# start. The References section is never sent, and gaps are marked with
+# "[...]".
+#
+# The output reservation scales with the summary length and language.
+
+import math
+import re
+import threading
+
+from . import settings
+from .doc_index import ABSTRACT_FALLBACK_CHARS, build_index
+
+# (context window, max output tokens) per model
+MODEL_LIMITS = {
+    "gemini-2.5-flash": (1_048_576, 65_536),
+    "gemini-2.5-pro": (1_048_576, 65_536),
+    "gemini-3-flash": (1_048_576, 65_536),
+    "gemini-3-pro": (1_048_576, 65_536),
+    "gemini-1.5-flash-002": (1_048_576, 8_192),
+    "mistral-small-latest": (128_000, 8_192),
+}
+DEFAULT_LIMITS = (32_000, 4_096)
+
+# Output reserved per summary length, in English tokens
+OUTPUT_TOKENS = {
+    "Short": 400,
+    "Medium": 1000,
+    "Detailed": 2000,
+}
+# Chunk notes and other calls that don't name a length
+DEFAULT_OUTPUT_TOKENS = 2000
+
+# The same summary takes more tokens in languages the tokenizers saw less
+# of; these are rough multipliers over English
+LANGUAGE_OUTPUT_FACTOR = {
+    "English": 1.0,
+    "Afrikaans": 1.3,
+}
+OTHER_LANGUAGE_OUTPUT_FACTOR = 1.8
+
+# System prompt, message wrapper and the "PAPER TEXT:" label
+OVERHEAD_TOKENS = 100
+
+# Head room over the estimate, which can still be off for unusual text
+SAFETY_MARGIN = 1.1
+
+# Pieces of text that are at least one token each: runs of letters, runs
+# of digits (one token per digit) and single symbols
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+
+# Letters per token within a word, beyond the first token
+LETTERS_PER_TOKEN = 5
+
+# Text with fewer of these common English words than ENGLISH_SHARE (as a
+# share of all words) costs up to NON_ENGLISH_FACTOR times more
+_ENGLISH_WORDS = frozenset("the of and to in is that for are with as on this by be from".split())
+ENGLISH_SHARE = 0.15
+NON_ENGLISH_FACTOR = 1.4
+
+GAP_MARKER = "\n[...]\n"
+
+# Paragraphs longer than this are packed a few lines at a time
+UNIT_CHARS = 800
+
+# Lower is sent first
+SECTION_PRIORITY = {
+    "heading": 0,
+    "opening": 0,
+    "abstract": 0,
+    "results": 1,
+    "conclusion": 1,
+    "discussion": 2,
+    "introduction": 3,
+    "methods": 3,
+    "other": 4,
+    None: 4,
+    "literature": 5,
+    "acknowledgements": 6,
+    "appendix": 6,
+}
+
+_lock = threading.Lock()
+_factors = {}
+
+
+def _model_name(model):
+    """"v1beta/models/gemini-2.5-flash" -> "gemini-2.5-flash" """
+    return (model or "").rsplit("/", 1)[-1]
+
+
+def limits(model):
+    """(context window, max output tokens) for a model name"""
+    return MODEL_LIMITS.get(_model_name(model), DEFAULT_LIMITS)
+
+
+# ============================================
+# ESTIMATES
+# ============================================
+
+def language_factor(text):
+    """1.0 for English text, up to NON_ENGLISH_FACTOR for text with no common English words"""
+    words = re.findall(r"[^\W\d_]+", text[:20000].lower())
+    if not words:
+        return 1.0
+    share = sum(1 for w in words if w in _ENGLISH_WORDS) / len(words)
+    return 1.0 + (NON_ENGLISH_FACTOR - 1.0) * max(0.0, 1.0 - share / ENGLISH_SHARE)
+
+
+def _raw_estimate(text, factor=None):
+    """Token estimate before the per-model correction"""
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece.isalpha():
+            tokens += 1 + (len(piece) - 1) // LETTERS_PER_TOKEN
+        else:
+            tokens += len(piece)
+    return tokens * (language_factor(text) if factor is None else factor)
+
+
+def correction(model):
+    """Learned ratio of reported to estimated tokens for a model (1.0 until seen)"""
+    with _lock:
+        return _factors.get(_model_name(model), 1.0)
+
+
+def estimate_tokens(text, model=None):
+    """Estimated input tokens of `text` for `model`"""
+    return math.ceil(_raw_estimate(text) * correction(model))
+
+
+def observe(model, sent_text, reported_tokens):
+    """Correct future estimates for `model` with the tokens a request really used"""
+    estimated = _raw_estimate(sent_text)
+    if not estimated or not reported_tokens:
+        return
+    ratio = min(3.0, max(0.5, reported_tokens / estimated))
+    name = _model_name(model)
+    with _lock:
+        previous = _factors.get(name)
+        _factors[name] = ratio if previous is None else 0.7 * previous + 0.3 * ratio
+
+
+def chars_for_tokens(tokens, text=""):
+    """About how many characters of `text` make up `tokens` tokens"""
+    sample = text[:20000]
+    estimated = _raw_estimate(sample)
+    if not estimated:
+        return tokens * 4
+    return int(tokens * len(sample) / estimated)
+
+
+# ============================================
+# BUDGETS
+# ============================================
+
+def output_tokens(summary_length, language):
+    """Tokens to reserve for a summary of this length in this language"""
+    base = OUTPUT_TOKENS.get(summary_length, DEFAULT_OUTPUT_TOKENS)
+    return int(base * LANGUAGE_OUTPUT_FACTOR.get(language, OTHER_LANGUAGE_OUTPUT_FACTOR))
+
+
+def translation_output_tokens(text, language):
+    """Tokens to reserve for translating `text` into `language`"""
+    factor = LANGUAGE_OUTPUT_FACTOR.get(language, OTHER_LANGUAGE_OUTPUT_FACTOR)
+    return int(_raw_estimate(text) * factor * SAFETY_MARGIN) + 200
+
+
+def max_output(model, requested=None):
+    """Output tokens to ask `model` for: the request, within the model's limit"""
+    return min(requested or DEFAULT_OUTPUT_TOKENS, limits(model)[1])
+
+
+def input_budget(model, reserved_output=None):
+    """Tokens of prompt plus paper text that can be sent to `model`"""
+    window, _ = limits(model)
+    reserved = max_output(model, reserved_output)
+    return min(window - reserved, settings.MAX_INPUT_TOKENS) - OVERHEAD_TOKENS
+
+
+def text_chars(prompt, text, model, reserved_output=None):
+    """About how many characters of `text` fit next to `prompt` in `model`'s input budget"""
+    factor = correction(model) * SAFETY_MARGIN
+    tokens = input_budget(model, reserved_output) - math.ceil(_raw_estimate(prompt) * factor)
+    return chars_for_tokens(max(0, int(tokens / factor)), text)
+
+
+def fit(prompt, text, model, reserved_output=None):
+    """`text`, packed if needed so that prompt + text fit `model`'s input budget"""
+    factor = correction(model) * SAFETY_MARGIN
+    budget = input_budget(model, reserved_output) - math.ceil(_raw_estimate(prompt) * factor)
+    # No piece costs more than NON_ENGLISH_FACTOR tokens per character
+    if len(text) * NON_ENGLISH_FACTOR * factor <= budget:
+        return text
+    if _raw_estimate(text) * factor <= budget:
+        return text
+    return pack(text, max(0, int(budget / factor)))
+
+
+# ============================================
+# PACKING
+# ============================================
+
+def _units(text, heading_starts):
+    """(start, end) spans of paragraphs, long ones split every UNIT_CHARS.
+
+    Section headings are units of their own.
+    """
+    units = []
+    start = position = 0
+    for line in text.split("\n"):
+        end = min(position + len(line) + 1, len(text))
+        if position in heading_starts:
+            if start < position:
+                units.append((start, position))
+            units.append((position, end))
+            start = end
+        elif not line.strip() or end - start >= UNIT_CHARS:
+            if start < end:
+                units.append((start, end))
+            start = end
+        position = end
+    if start < len(text):
+        units.append((start, len(text)))
+    return units
+
+
+def _classify(start, doc, heading_starts):
+    """(priority, section number) of the unit at `start`; priority None = don't send"""
+    if doc.references and doc.references[0] <= start < doc.references[1]:
+        return None, None
+    if start in heading_starts:
+        return SECTION_PRIORITY["heading"], None
+    kind, number = None, -1
+    for i, section in enumerate(doc.sections):
+        if section.start > start:
+            break
+        kind, number = (section.kind, i) if start < section.end else (None, -1)
+    if number == -1 and (not doc.sections or start < doc.sections[0].start):
+        kind = "opening" if start < ABSTRACT_FALLBACK_CHARS else None
+    return SECTION_PRIORITY.get(kind, SECTION_PRIORITY[None]), number
+
+
+def pack(text, budget):
+    """The highest-value parts of `text` that fit in `budget` tokens, in reading order"""
+    doc = build_index([text])
+    heading_starts = {s.start for s in doc.sections}
+    if doc.references:
+        heading_starts.add(doc.references[0])
+
+    # Sort key (priority, nth unit of its section, position): sections of
+    # equal value take turns, so a long Results doesn't crowd out Conclusion
+    ranked = []
+    seen = {}
+    for start, end in _units(text, heading_starts):
+        priority, section = _classify(start, doc, heading_starts)
+        if priority is None or not text[start:end].strip():
+            continue
+        nth = seen[section] = seen.get(section, -1) + 1
+        ranked.append(((priority, 0 if section is None else nth, start), end))
+    ranked.sort()
+
+    factor = language_factor(text)
+    gap_cost = _raw_estimate(GAP_MARKER, 1.0)
+    chosen = []
+    used = 0
+    for (priority, _, start), end in ranked:
+        cost = _raw_estimate(text[start:end], factor) + gap_cost
+        if used + cost > budget:
+            # Headings are tiny; past them, a unit that doesn't fit ends the
+            # packing rather than leaving stray fragments further on
+            if priority == SECTION_PRIORITY["heading"]:
+                continue
+            break
+        chosen.append((start, end))
+        used += cost
+
+    parts = []
+    previous_end = 0
+    for start, end in sorted(chosen):
+        if start > previous_end:
+            parts.append(GAP_MARKER)
+        parts.append(text[start:end])
+        previous_end = end
+    if previous_end < len(text):
+        parts.append(GAP_MARKER)
+    return "".join(parts).strip("\n")
@@ -0,0 +1,198 @@
+# ============================================
+# MAP-REDUCE SUMMARIZATION FOR LONG PAPERS
+# ============================================
+# Instead of cutting a thesis off at the first 20-30k characters, text
+# that doesn't fit the model's input budget (see zalingo/budget.py) is
+# split at section/paragraph boundaries into chunks that do. Each chunk is
+# condensed into notes in parallel (bounded by settings.MAP_CONCURRENCY),
+# and the notes are reduced into the requested summary with the user's
+# prompt. Text that fits goes out in a single call.
+#
+# Chunk notes use a neutral English prompt and are cached per chunk text
+# and the model that wrote them, so switching summary type, length or language on the same
+# paper only pays for the final reduce call.
+
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from . import budget
+from . import metrics
+from . import settings
+from . import summary_cache
+from .providers import GEMINI_REST_ENDPOINTS, MISTRAL_MODEL, answered_by
+
+# The model each provider's budget is planned for (every Gemini candidate
+# has the same context window)
+PROVIDER_MODELS = {
+    "gemini": GEMINI_REST_ENDPOINTS[0],
+    "mistral": MISTRAL_MODEL,
+}
+
+CHUNK_PROMPT = (
+    "The text below is one consecutive part of a longer academic paper. "
+    "Write detailed notes on everything in this part: research question, "
+    "methodology, results, findings and conclusions. Keep numbers, names of "
+    "sections and key terms. Do not include references."
+)
+
+REDUCE_NOTE = (
+    "The paper has been condensed into notes, one block per consecutive "
+    "part of the paper. Base your answer on all of the notes."
+)
+
+# A line that looks like a section heading ("3. Results", "IV. DISCUSSION",
+# "Conclusion") - chunks prefer to start on one of these
+_HEADING_RE = re.compile(
+    r"^\s*((\d+(\.\d+)*|[IVX]+)\.?\s+)?[A-Z][A-Za-z ,&:-]{2,60}\s*$"
+)
+
+
+def chunk_chars(provider, text="", prompt=CHUNK_PROMPT):
+    """Characters of `text` that fit next to `prompt` in one call to `provider` ("gemini"/"mistral")"""
+    return budget.text_chars(prompt, text, PROVIDER_MODELS[provider])
+
+
+def _paragraphs(text):
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+def _split_long_paragraph(paragraph, max_chars):
+    """Break an oversized paragraph at sentence ends, then hard-wrap"""
+    pieces, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text, max_chars):
+    """Split text into chunks of at most `max_chars`, on paragraph boundaries.
+
+    A chunk is closed early when a section heading arrives and the chunk
+    is already more than half full, so sections tend to stay together.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    blocks = []
+    for paragraph in _paragraphs(text):
+        if len(paragraph) > max_chars:
+            blocks.extend(_split_long_paragraph(paragraph, max_chars))
+        else:
+            blocks.append(paragraph)
+
+    chunks, current = [], []
+    size = 0
+    for block in blocks:
+        first_line = block.split("\n", 1)[0]
+        starts_section = bool(_HEADING_RE.match(first_line))
+        too_big = size + len(block) + 2 > max_chars
+        if current and (too_big or (starts_section and size > max_chars // 2)):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _chunk_cache_key(chunk, model_id):
+    blob = f"{model_id}\n{CHUNK_PROMPT}\n{summary_cache.normalize_text(chunk)}"
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _cached_note(chunk, model_ids):
+    for model_id in model_ids:
+        note = summary_cache.get("chunk", _chunk_cache_key(chunk, model_id))
+        if note:
+            return note
+    return None
+
+
+def summarize_chunks(chunks, call, model_ids, max_workers=None, initializer=None):
+    """Return notes for every chunk (in order), using cached notes where possible.
+
+    `call(prompt, text)` performs one provider request and returns the text
+    or None. Cached notes by any of `model_ids` are reused; new notes are
+    cached under the model that wrote them. Returns None if any chunk could
+    not be summarized.
+    """
+    notes = [_cached_note(chunk, model_ids) for chunk in chunks]
+    todo = [i for i, note in enumerate(notes) if not note]
+    for note in notes:
+        metrics.count_cache("chunk", bool(note))
+
+    def write_note(i):
+        with answered_by() as answers:
+            note = call(CHUNK_PROMPT, chunks[i])
+        if note and answers:
+            summary_cache.put("chunk", _chunk_cache_key(chunks[i], answers[-1]), note)
+        return note
+
+    if todo:
+        workers = min(max_workers or settings.MAP_CONCURRENCY, len(todo))
+        with ThreadPoolExecutor(max_workers=workers, initializer=initializer) as pool:
+            results = pool.map(metrics.in_context(write_note), todo)
+            for i, note in zip(todo, results):
+                notes[i] = note
+
+    if not all(notes):
+        return None
+    return notes
+
+
+# How many times notes may be re-condensed before we give up and let the
+# provider call pack them to its budget
+MAX_REDUCE_DEPTH = 2
+
+
+def map_reduce_summarize(paper_text, prompt, call, provider, model_ids,
+                         max_workers=None, initializer=None, on_split=None,
+                         final_call=None, _depth=0):
+    """Summarize `paper_text` with `prompt`, chunking it if it's too long.
+
+    Papers that fit the model's input budget go straight to a single
+    `call(prompt, paper_text)`. `provider` picks the budget; chunk notes
+    cached by any of `model_ids` (see zalingo.providers.model_id) are
+    reused. `on_split(n)` is told how many chunks a long paper was split
+    into. If the combined notes are still too
+    long they are condensed again, up to MAX_REDUCE_DEPTH levels.
+    `final_call`, if given, is used instead of `call` for the one request
+    that produces the answer (e.g. a streaming variant).
+    """
+    final_call = final_call or call
+    if len(paper_text) <= chunk_chars(provider, paper_text, prompt):
+        return final_call(prompt, paper_text)
+    chunks = split_text(paper_text, chunk_chars(provider, paper_text))
+    if len(chunks) == 1:
+        return final_call(prompt, paper_text)
+
+    if on_split and _depth == 0:
+        on_split(len(chunks))
+
+    notes = summarize_chunks(chunks, call, model_ids, max_workers, initializer)
+    if notes is None:
+        return None
+
+    combined = "\n\n".join(
+        f"[Part {i} of {len(notes)}]\n{note}" for i, note in enumerate(notes, 1)
+    )
+    if len(combined) > chunk_chars(provider, combined, prompt) and _depth < MAX_REDUCE_DEPTH:
+        return map_reduce_summarize(
+            combined, prompt, call, provider, model_ids,
+            max_workers, initializer, on_split, final_call, _depth + 1
+        )
+    return final_call(f"{prompt}\n\n{REDUCE_NOTE}", combined)
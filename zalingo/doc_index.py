@@ -0,0 +1,209 @@
+# ============================================
+# DOCUMENT INDEX
+# ============================================
+# Structured view of an extracted paper: the page texts, the section
+# headings we could detect (with character offsets into the full text)
+# and the span of the References section. Summary modes use it to send
+# the provider only the parts of the paper they need, and the References
+# section is never sent at all.
+
+import re
+from dataclasses import dataclass, field
+
+# Canonical section kinds, matched against a lower-cased heading title.
+# Order matters: the first kind whose keyword appears in the title wins.
+SECTION_KEYWORDS = [
+    ("references", ("references", "bibliography", "works cited", "literature cited")),
+    ("abstract", ("abstract",)),
+    ("introduction", ("introduction", "background")),
+    ("literature", ("literature review", "related work")),
+    ("methods", ("method", "materials", "study design", "experimental setup", "data and")),
+    ("results", ("result", "findings", "experiments", "evaluation")),
+    ("discussion", ("discussion",)),
+    ("conclusion", ("conclusion", "concluding", "summary and", "future work")),
+    ("acknowledgements", ("acknowledg",)),
+    ("appendix", ("appendix", "supplementary")),
+]
+
+# Which section kinds each summary type needs. Modes not listed (and
+# papers where none of the kinds were found) get the whole body.
+SUMMARY_SECTIONS = {
+    "Abstract only": ("abstract",),
+    "Introduction + Conclusion": ("introduction", "conclusion"),
+    "Key findings only": ("abstract", "results", "discussion", "conclusion"),
+}
+
+# Without a detected Abstract heading, this much of the opening text is
+# treated as the abstract; with one, the abstract is capped in case the
+# heading that follows it was missed
+ABSTRACT_FALLBACK_CHARS = 3000
+ABSTRACT_MAX_CHARS = 6000
+
+_NUMBER = r"(?:\d+(?:\.\d+)*|[IVXLC]+)"
+_HEADING_RE = re.compile(
+    rf"^\s*(?:(?P<number>{_NUMBER})[.)]?\s+)?(?P<title>[A-Za-z][A-Za-z &/,:'-]{{2,60}}?)\s*[:.]?\s*$"
+)
+# "Abstract: We study..." / "ABSTRACT— This paper..." on a single line
+_INLINE_ABSTRACT_RE = re.compile(r"^\s*abstract\s*[:.—–-]", re.IGNORECASE)
+
+
+@dataclass
+class Section:
+    title: str
+    kind: str
+    start: int
+    end: int = 0
+
+
+@dataclass
+class DocumentIndex:
+    pages: list
+    text: str
+    page_offsets: list
+    sections: list = field(default_factory=list)
+    references: tuple = None
+    # Filled in by extraction: per-page PageResults, and False when
+    # extraction stopped before the last page
+    page_stats: list = field(default_factory=list)
+    complete: bool = True
+
+    def body(self):
+        """Full text with the References section cut out"""
+        if not self.references:
+            return self.text
+        start, end = self.references
+        return self.text[:start] + self.text[end:]
+
+    def sections_of(self, kind):
+        return [s for s in self.sections if s.kind == kind]
+
+    def abstract(self):
+        found = self.sections_of("abstract")
+        if found:
+            return self.text[found[0].start:found[0].end][:ABSTRACT_MAX_CHARS]
+        # No heading: take whatever precedes the first detected section
+        first = self.sections[0].start if self.sections else 0
+        if first > 200:
+            return self.text[:min(first, ABSTRACT_FALLBACK_CHARS)]
+        return self.body()[:ABSTRACT_FALLBACK_CHARS]
+
+    def text_for(self, summary_type):
+        """The slice of the paper a summary type needs (never the references)"""
+        kinds = SUMMARY_SECTIONS.get(summary_type)
+        if not kinds:
+            return self.body()
+        if summary_type == "Abstract only":
+            return self.abstract()
+
+        # "Introduction + Conclusion" on a paper without a Conclusion heading
+        if "conclusion" in kinds and not self.sections_of("conclusion"):
+            kinds = kinds + ("discussion",)
+
+        parts = []
+        for kind in kinds:
+            if kind == "abstract":
+                parts.append(self.abstract())
+            else:
+                parts.extend(self.text[s.start:s.end] for s in self.sections_of(kind))
+
+        if sum(1 for kind in kinds if kind != "abstract" and self.sections_of(kind)) == 0:
+            # Headings weren't detected well enough to trust a slice
+            return self.body()
+        return "\n\n".join(p.strip() for p in parts if p.strip())
+
+    def page_of(self, offset):
+        """1-based page number that contains character `offset`"""
+        page = 0
+        for i, start in enumerate(self.page_offsets):
+            if start > offset:
+                break
+            page = i
+        return page + 1
+
+
+def classify_heading(title):
+    lowered = title.lower()
+    for kind, keywords in SECTION_KEYWORDS:
+        if any(k in lowered for k in keywords):
+            return kind
+    return None
+
+
+def _match_heading(line):
+    """Return (title, kind) if `line` looks like a section heading"""
+    if _INLINE_ABSTRACT_RE.match(line):
+        return "Abstract", "abstract"
+
+    match = _HEADING_RE.match(line)
+    if not match:
+        return None
+    title = match.group("title").strip()
+    number = match.group("number")
+    if len(title.split()) > 6 or not title[0].isupper():
+        return None
+
+    kind = classify_heading(title)
+    if number:
+        if kind:
+            return title, kind
+        # Unknown numbered top-level headings ("4 Case Study") still end the
+        # previous section; sub-sections ("4.2 Data") don't
+        if "." not in number:
+            return title, "other"
+        return None
+
+    # Unnumbered lines only count if they look like a heading: a known
+    # section name in Title Case or ALL CAPS, without a sentence full stop
+    if kind and not line.rstrip().endswith(".") and _is_title_case(title):
+        return title, kind
+    return None
+
+
+def _is_title_case(title):
+    words = [w for w in re.split(r"[\s/&,-]+", title) if len(w) > 3]
+    return all(w[0].isupper() for w in words)
+
+
+def build_index(pages):
+    """Build a DocumentIndex from a list of page texts"""
+    pages = [p or "" for p in pages]
+    offsets, parts = [], []
+    position = 0
+    for page in pages:
+        offsets.append(position)
+        parts.append(page + "\n")
+        position += len(page) + 1
+    text = "".join(parts)
+
+    sections = []
+    line_start = 0
+    for line in text.split("\n"):
+        found = _match_heading(line) if line.strip() else None
+        if found:
+            title, kind = found
+            sections.append(Section(title=title, kind=kind, start=line_start))
+        line_start += len(line) + 1
+
+    for current, following in zip(sections, sections[1:] + [None]):
+        current.end = following.start if following else len(text)
+
+    references = None
+    refs = [s for s in sections if s.kind == "references"]
+    if refs:
+        # From the last References heading up to an appendix (or the end)
+        start = refs[-1].start
+        end = len(text)
+        for s in sections:
+            if s.start > start and s.kind in ("appendix", "acknowledgements"):
+                end = s.start
+                break
+        references = (start, end)
+        sections = [s for s in sections if not (start <= s.start < end)]
+
+    return DocumentIndex(
+        pages=pages,
+        text=text,
+        page_offsets=offsets,
+        sections=sections,
+        references=references
+    )
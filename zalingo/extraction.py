@@ -0,0 +1,405 @@
+# ============================================
+# STREAMING PDF EXTRACTION
+# ============================================
+# Pages are extracted one at a time and yielded as they are ready:
+#   - PyPDF2 first; pages where it finds (almost) no text are retried with
+#     pdfplumber on their own, instead of re-reading the whole document
+#   - extraction stops early once a character budget is reached, for
+#     summary modes that only need the start of the paper
+#   - every page reports which backend produced it and how long it took,
+#     so slow PDFs can be spotted
+#
+# Large PDFs (settings.PARALLEL_MIN_PAGES and up) can instead be split
+# into page ranges extracted across a process pool; both paths share the
+# same per-page code, so the output is identical.
+#
+# Spooled uploads (a file path, see zalingo/spool.py) are always extracted
+# in the pool, whose workers run under settings.JOB_MEMORY_BUDGET: a PDF
+# that needs more fails that job with ExtractionMemoryError instead of
+# taking the whole app down. pdfplumber's per-page layout objects are
+# released as soon as a page is done.
+#
+# Pages still without text after both backends (scans) are OCRed when the
+# optional OCR engine is installed (see zalingo/ocr.py), spread over the
+# same pool and cached per page.
+#
+# PyPDF2 and pdfplumber are imported on first use, so importing this
+# module (and starting the app) doesn't load them.
+
+import errno
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from . import metrics, ocr, settings
+from .spool import open_mmap
+
+# A PyPDF2 page with fewer characters than this is retried with pdfplumber
+MIN_PAGE_CHARS = 20
+
+# Summary modes that only read the opening of the paper don't need the
+# whole PDF extracted. Modes not listed read every page.
+SUMMARY_CHAR_BUDGETS = {
+    "Abstract only": 20000,
+}
+
+
+@dataclass
+class PageResult:
+    number: int
+    text: str
+    backend: str
+    seconds: float
+    chars: int = 0
+
+
+class ExtractionMemoryError(MemoryError):
+    """A PDF needed more memory than settings.JOB_MEMORY_BUDGET to extract"""
+
+
+def _independent_source(pdf_file):
+    """A second handle on the PDF so pdfplumber doesn't move PyPDF2's stream"""
+    if isinstance(pdf_file, str):
+        return pdf_file
+    if isinstance(pdf_file, bytes):
+        return io.BytesIO(pdf_file)
+    if hasattr(pdf_file, "getvalue"):
+        return io.BytesIO(pdf_file.getvalue())
+    pdf_file.seek(0)
+    return io.BytesIO(pdf_file.read())
+
+
+def _open_reader(source):
+    """(PdfReader, mmap or None): paths are read through a memory map"""
+    import PyPDF2
+
+    if isinstance(source, str):
+        mapped = open_mmap(source)
+        return PyPDF2.PdfReader(mapped), mapped
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return PyPDF2.PdfReader(source), None
+
+
+class _LazyPlumber:
+    """Opens (and imports) pdfplumber on first use only; most pages never need it"""
+
+    def __init__(self, source):
+        self.source = source
+        self.pdf = None
+
+    def page(self, index):
+        if self.pdf is None:
+            import pdfplumber
+            self.pdf = pdfplumber.open(_independent_source(self.source))
+        return self.pdf.pages[index]
+
+    def close(self):
+        if self.pdf is not None:
+            self.pdf.close()
+
+
+def _extract_page(page, index, plumber):
+    """Extract one page, falling back to pdfplumber for that page only"""
+    started = time.perf_counter()
+    text = page.extract_text() or ""
+    backend = "pypdf2"
+
+    if len(text.strip()) < MIN_PAGE_CHARS:
+        plumber_page = plumber.page(index)
+        try:
+            fallback = plumber_page.extract_text() or ""
+        finally:
+            # Drop the page's cached layout objects (chars, lines, ...) now
+            plumber_page.close()
+        if len(fallback.strip()) > len(text.strip()):
+            text, backend = fallback, "pdfplumber"
+
+    return PageResult(index + 1, text, backend, time.perf_counter() - started, len(text))
+
+
+class PageStream:
+    """Iterate over a PDF's pages as PageResults.
+
+    `page_count` is known up front; after iteration `stopped_early` says
+    whether `char_budget` cut extraction short.
+    """
+
+    def __init__(self, pdf_file, char_budget=None):
+        self.pdf_file = pdf_file
+        self.char_budget = char_budget
+        self.reader, self.mapped = _open_reader(pdf_file)
+        self.page_count = len(self.reader.pages)
+        self.stopped_early = False
+
+    def close(self):
+        if self.mapped is not None:
+            self.reader = None
+            self.mapped.close()
+            self.mapped = None
+
+    def __iter__(self):
+        plumber = _LazyPlumber(self.pdf_file)
+        total_chars = 0
+        try:
+            for index in range(self.page_count):
+                result = _extract_page(self.reader.pages[index], index, plumber)
+                yield result
+
+                total_chars += len(result.text) + 1
+                if self.char_budget and total_chars >= self.char_budget and index + 1 < self.page_count:
+                    self.stopped_early = True
+                    return
+        finally:
+            plumber.close()
+            self.close()
+
+
+# ============================================
+# PARALLEL EXTRACTION
+# ============================================
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def _limit_memory(limit):
+    """Worker initializer: cap the process's address space at `limit` bytes"""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows; extraction just runs uncapped there
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _get_pool(workers):
+    """Process pool shared across Streamlit reruns (spawned, not forked,
+    because the Streamlit server process is multi-threaded)"""
+    with _pool_lock:
+        if workers not in _pools:
+            budget = settings.JOB_MEMORY_BUDGET
+            _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_memory if budget else None,
+                initargs=(budget,) if budget else ()
+            )
+        return _pools[workers]
+
+
+def _submit(workers, fn, *args):
+    """Submit to the shared pool, replacing it once if a worker died earlier"""
+    try:
+        return _get_pool(workers).submit(fn, *args)
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pools.pop(workers, None)
+        return _get_pool(workers).submit(fn, *args)
+
+
+def _extract_range(source, start, stop):
+    """Worker: extract pages [start, stop) of the PDF in `source` (stop=None: to the end)"""
+    reader, mapped = _open_reader(source)
+    if stop is None:
+        stop = len(reader.pages)
+    plumber = _LazyPlumber(source)
+    try:
+        return [_extract_page(reader.pages[i], i, plumber) for i in range(start, stop)]
+    finally:
+        plumber.close()
+        reader = None
+        if mapped is not None:
+            mapped.close()
+
+
+def _extract_stream(source, char_budget):
+    """Worker: PageStream over `source`; returns (page_results, stopped_early)"""
+    stream = PageStream(source, char_budget)
+    results = list(stream)
+    return results, stream.stopped_early
+
+
+def _memory_error():
+    return ExtractionMemoryError(
+        f"This PDF needs more than {settings.JOB_MEMORY_BUDGET // (1024 * 1024)} MB to extract "
+        f"(ZALINGO_JOB_MEMORY_MB)"
+    )
+
+
+def _result(future):
+    """future.result(), with a worker running out of memory reported clearly"""
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        # A worker over the cap can also be killed outright (e.g. a native
+        # library aborting on a failed allocation); _submit replaces the pool
+        if not settings.JOB_MEMORY_BUDGET:
+            raise
+        raise _memory_error() from e
+    except (MemoryError, OSError) as e:
+        # Under the address-space cap, running out can also surface as ENOMEM
+        if isinstance(e, OSError) and e.errno != errno.ENOMEM:
+            raise
+        raise _memory_error() from e
+
+
+def _extract_document(source):
+    """Worker: every page of `source`, OCRing scanned pages in this same worker"""
+    results = _extract_range(source, 0, None)
+    if ocr.available() and any(r.chars < MIN_PAGE_CHARS for r in results):
+        results, _ = _fill_with_ocr(source, results, None, 1, in_process=True)
+    return results
+
+
+def extract_async(pdf_file, workers=None):
+    """Submit a whole PDF to the process pool; returns a Future of PageResults.
+
+    Used to extract many papers at once (one paper per worker).
+    """
+    return _submit(workers or settings.EXTRACTION_WORKERS, _extract_document, _raw_source(pdf_file))
+
+
+def _page_ranges(page_count, parts):
+    size = -(-page_count // parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _raw_source(pdf_file):
+    """Something picklable that a worker process can open: a path or bytes"""
+    if isinstance(pdf_file, (str, bytes)):
+        return pdf_file
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def extract_pages(pdf_file, char_budget=None, workers=None):
+    """Extract a PDF, returning (page_results, complete).
+
+    Big PDFs without a character budget are spread over a process pool in
+    contiguous page ranges and reassembled in page order; everything else
+    goes through PageStream, in-process unless `pdf_file` is a spooled
+    path (those always run in the memory-capped pool). Pages without a
+    text layer are then OCRed, if OCR is available.
+    """
+    workers = workers or settings.EXTRACTION_WORKERS
+    results, complete = _extract_text_layer(pdf_file, char_budget, workers)
+
+    if ocr.available() and any(r.chars < MIN_PAGE_CHARS for r in results):
+        results, truncated = _fill_with_ocr(_raw_source(pdf_file), results, char_budget, workers)
+        complete = complete and not truncated
+    return results, complete
+
+
+def _extract_text_layer(pdf_file, char_budget, workers):
+    stream = PageStream(pdf_file, char_budget)
+    spooled = isinstance(pdf_file, str) and settings.JOB_MEMORY_BUDGET
+
+    if char_budget or workers < 2 or stream.page_count < settings.PARALLEL_MIN_PAGES:
+        if spooled:
+            stream.close()
+            results, stopped_early = _result(_submit(workers, _extract_stream, pdf_file, char_budget))
+            return results, not stopped_early
+        results = list(stream)
+        return results, not stream.stopped_early
+
+    page_count = stream.page_count
+    stream.close()
+
+    source = _raw_source(pdf_file)
+    # A few ranges per worker so one slow (e.g. image-heavy) range doesn't
+    # leave the other workers idle
+    futures = [
+        _submit(workers, _extract_range, source, start, stop)
+        for start, stop in _page_ranges(page_count, workers * 3)
+    ]
+    results = []
+    for future in futures:
+        results.extend(_result(future))
+    return results, True
+
+
+# ============================================
+# OCR OF SCANNED PAGES
+# ============================================
+
+def _ocr_task(source, index):
+    """Worker: OCR one page; returns (text, seconds)"""
+    return ocr.ocr_page(source, index)
+
+
+def _fill_with_ocr(source, results, char_budget, workers, in_process=False):
+    """OCR the pages in `results` that have no text layer; returns (results, truncated).
+
+    Pages OCRed before are filled from the cache. The rest are OCRed in
+    page order across the process pool - in waves when there is a
+    `char_budget`, so we can stop once enough text has been read (the
+    results are then cut after the last page read, and `truncated` is
+    True).
+    """
+    missing = [r.number - 1 for r in results if r.chars < MIN_PAGE_CHARS]
+    reader, mapped = _open_reader(source)
+    try:
+        digests = {i: ocr.page_digest(reader.pages[i]) for i in missing}
+    finally:
+        reader = None
+        if mapped is not None:
+            mapped.close()
+
+    results = list(results)
+
+    def fill(i, text, backend, seconds):
+        if len(text.strip()) > len(results[i].text.strip()):
+            results[i] = PageResult(i + 1, text, backend, seconds, len(text))
+
+    todo = []
+    for i in missing:
+        cached = ocr.cached_text(digests[i])
+        if cached is None:
+            todo.append(i)
+        else:
+            fill(i, cached, "ocr-cache", 0.0)
+
+    use_pool = not in_process and (workers >= 2 or (isinstance(source, str) and settings.JOB_MEMORY_BUDGET))
+    wave = max(1, workers * 2 if char_budget else len(todo))
+
+    with metrics.span("ocr", pages=len(todo), cached=len(missing) - len(todo)):
+        for start in range(0, len(todo), wave):
+            batch = todo[start:start + wave]
+            if use_pool:
+                pending = [(i, _submit(workers, _ocr_task, source, i)) for i in batch]
+            else:
+                pending = [(i, None) for i in batch]
+
+            for i, future in pending:
+                try:
+                    text, seconds = _result(future) if future is not None else _ocr_task(source, i)
+                except ExtractionMemoryError:
+                    raise
+                except Exception as e:
+                    # One unreadable page shouldn't lose the rest of the scan
+                    ocr.logger.warning("OCR failed on page %d: %s", i + 1, e)
+                    continue
+                ocr.store_text(digests[i], text)
+                fill(i, text, "ocr", seconds)
+
+            if char_budget:
+                last = batch[-1]
+                if sum(r.chars for r in results[:last + 1]) >= char_budget and last + 1 < len(results):
+                    return results[:last + 1], True
+
+    return results, False
+
+
+def budget_for(summary_type):
+    """Character budget for a summary mode, or None for the whole paper"""
+    return SUMMARY_CHAR_BUDGETS.get(summary_type)
@@ -0,0 +1,320 @@
+# ============================================
+# HEDGED PROVIDER REQUESTS
+# ============================================
+# During a Gemini outage the REST fallback used to walk its endpoint list
+# one by one, paying a full round trip (plus retries) for every dead model
+# before trying the next. Here the candidates race instead:
+#   - the first candidate starts at once, and the next one as soon as an
+#     attempt fails
+#   - if an attempt is much slower than its endpoint usually is
+#     (HEDGE_SLOWDOWN times its last time to headers, and at least
+#     settings.HEDGE_DELAY seconds), another *model* of the same provider
+#     is fired as well. A hedge costs quota and the loser can't be stopped
+#     on the server, so the same model on another API version, or the
+#     backup provider, is only ever tried after a failure
+#   - the first 200 response wins and every other attempt is cancelled
+#   - failures are remembered per (endpoint, API key): an endpoint that
+#     just failed is skipped for a cool-down that doubles with every
+#     consecutive failure, and after a 404 (model not available for this
+#     key) for as long as the model cache trusts a model
+# Requests are streamed, so "answered" means the response headers arrived;
+# a long generation never triggers a hedge by itself. The race runs on
+# asyncio, while the blocking HTTP calls go through transport.post on a
+# shared thread pool, so a losing request never holds up the caller.
+
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from . import metrics, scheduler, settings, transport
+from .streaming import iter_sse_json
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="zalingo-hedge")
+
+# Hedge once an attempt takes this many times its endpoint's last time to
+# response headers
+HEDGE_SLOWDOWN = 3.0
+
+_health = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class Candidate:
+    """One way of answering a request: a streaming endpoint and how to read it"""
+    name: str                   # model cache entry, e.g. "v1beta/models/gemini-2.5-flash"
+    label: str                  # shown to the user
+    provider: str               # transport provider: "gemini" or "mistral"
+    api_key: str
+    url: str
+    headers: dict
+    body: dict
+    extract: object             # SSE event -> text (or None)
+    usage: object = None        # SSE event -> (input, output) tokens, or None
+
+    @property
+    def model(self):
+        """"v1beta/models/gemini-2.5-flash" -> "gemini-2.5-flash" """
+        return self.name.rsplit("/", 1)[-1]
+
+    @property
+    def health_key(self):
+        digest = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16]
+        return f"{self.provider}:{self.name}:{digest}"
+
+
+class CandidateFailed(Exception):
+    """One candidate answered with an error status or could not be reached"""
+
+    def __init__(self, candidate, status=None, reason=""):
+        super().__init__(f"{candidate.label}: {reason}")
+        self.candidate = candidate
+        self.status = status
+
+
+class AllCandidatesFailed(Exception):
+    """Every candidate failed; `errors` holds one exception per attempt"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(str(e) for e in errors) or "no candidates")
+        self.errors = errors
+
+
+# ============================================
+# ENDPOINT HEALTH
+# ============================================
+
+@dataclass
+class Health:
+    failures: int = 0
+    down_until: float = 0.0
+    last_seconds: float = None  # time to response headers on the last success
+
+
+def record_success(key, seconds):
+    with _lock:
+        health = _health.setdefault(key, Health())
+        health.failures = 0
+        health.down_until = 0.0
+        health.last_seconds = seconds
+
+
+def record_failure(key, status=None, retry_after=None):
+    with _lock:
+        health = _health.setdefault(key, Health())
+        health.failures += 1
+        if status == 404:
+            cooldown = settings.MODEL_CACHE_TTL
+        elif retry_after is not None:
+            cooldown = min(retry_after, settings.HEALTH_MAX_COOLDOWN)
+        else:
+            cooldown = min(settings.HEALTH_COOLDOWN * (2 ** (health.failures - 1)), settings.HEALTH_MAX_COOLDOWN)
+        health.down_until = time.time() + cooldown
+
+
+def is_healthy(key):
+    with _lock:
+        health = _health.get(key)
+        return health is None or health.down_until <= time.time()
+
+
+def hedge_delay(candidate):
+    """Seconds without an answer from `candidate` before hedging"""
+    with _lock:
+        health = _health.get(candidate.health_key)
+        last = health.last_seconds if health is not None else None
+    if last is None:
+        return settings.HEDGE_DELAY
+    return max(settings.HEDGE_DELAY, HEDGE_SLOWDOWN * last)
+
+
+def healthy_first(candidates):
+    """Drop candidates known to be down; if that is all of them, try them all,
+    soonest-to-recover first"""
+    up = [c for c in candidates if is_healthy(c.health_key)]
+    if up:
+        return up
+    with _lock:
+        return sorted(candidates, key=lambda c: _health[c.health_key].down_until)
+
+
+# ============================================
+# THE RACE
+# ============================================
+
+def _close_quietly(future):
+    """Done-callback for an abandoned attempt: release its connection"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class _AttemptSlots:
+    """Scheduler slots for a race's requests on the caller's API key.
+
+    The caller already holds one slot (see zalingo/scheduler.py), which
+    covers one request; every further request in flight at the same time
+    takes an extra slot, and isn't sent if the key has none free. The
+    Mistral backup, on another key, is at most one request and isn't
+    counted.
+    """
+
+    def __init__(self, provider, api_key):
+        self.key = (provider, api_key)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.extra = []             # release functions of the extra slots
+
+    def take(self, candidate):
+        """Count a request about to be sent; False if the key has no slot for it"""
+        if (candidate.provider, candidate.api_key) != self.key:
+            return True
+        with self.lock:
+            if self.in_flight >= 1 + len(self.extra):
+                release = scheduler.extra_slot(*self.key)
+                if release is None:
+                    return False
+                self.extra.append(release)
+            self.in_flight += 1
+            return True
+
+    def done(self, candidate):
+        """A request that didn't win has finished"""
+        if (candidate.provider, candidate.api_key) != self.key:
+            return
+        with self.lock:
+            self.in_flight -= 1
+            while self.extra and len(self.extra) > self.in_flight - 1:
+                self.extra.pop()()
+
+
+async def _open(candidate, slots):
+    """Start one streamed request; returns (candidate, response) on a 200"""
+    started = time.monotonic()
+    # Hedging replaces per-endpoint retries, so each attempt is a single request
+    future = _executor.submit(
+        metrics.in_context(transport.post), candidate.provider, candidate.url, candidate.api_key,
+        retries=0, headers=candidate.headers, json=candidate.body, stream=True
+    )
+    try:
+        response = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # The worker thread can't be interrupted; drop its response when it lands
+        future.add_done_callback(_close_quietly)
+        future.add_done_callback(lambda _: slots.done(candidate))
+        raise
+    except Exception as e:
+        slots.done(candidate)
+        record_failure(candidate.health_key)
+        metrics.record("hedge_attempt", time.monotonic() - started,
+                       provider=candidate.provider, model=candidate.label, status="error")
+        raise CandidateFailed(candidate, reason=str(e)) from e
+
+    seconds = time.monotonic() - started
+    metrics.record("hedge_attempt", seconds,
+                   provider=candidate.provider, model=candidate.label, status=response.status_code)
+    if response.status_code != 200:
+        slots.done(candidate)
+        record_failure(candidate.health_key, response.status_code, transport.retry_after_seconds(response))
+        response.close()
+        raise CandidateFailed(candidate, response.status_code, f"HTTP {response.status_code}")
+
+    record_success(candidate.health_key, seconds)
+    return candidate, response
+
+
+async def race(candidates, delay=None, on_failure=None):
+    """Return (candidate, response) from the first candidate to answer 200.
+
+    The next candidate is started whenever one fails. While none has
+    answered after `delay` seconds (default: see hedge_delay), the next
+    candidate of the same provider with a model not yet in flight is
+    started too, if the API key has a free scheduler slot for it.
+    `on_failure(error)` is called for every failed attempt. Raises
+    AllCandidatesFailed.
+    """
+    if not candidates:
+        raise AllCandidatesFailed([])
+    waiting = list(candidates)
+    pending = {}                # task -> candidate
+    errors = []
+    slots = _AttemptSlots(candidates[0].provider, candidates[0].api_key)
+
+    def hedge_candidate():
+        running = list(pending.values())
+        return next((c for c in waiting
+                     if c.provider == running[0].provider
+                     and c.model not in {r.model for r in running}), None)
+
+    def launch(candidate):
+        """Start `candidate`; returns how long to wait before hedging"""
+        waiting.remove(candidate)
+        pending[asyncio.ensure_future(_open(candidate, slots))] = candidate
+        return delay if delay is not None else hedge_delay(candidate)
+
+    slots.take(waiting[0])        # covered by the caller's own slot
+    timeout = launch(waiting[0])
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Everything in flight is slow: hedge with another model, if
+                # there is one and the key has room for another request
+                candidate = hedge_candidate()
+                if candidate is None:
+                    timeout = None
+                elif slots.take(candidate):
+                    timeout = launch(candidate)
+                continue
+
+            winner = None
+            for task in done:
+                candidate = pending.pop(task)
+                if task.exception() is None:
+                    if winner is None:
+                        winner = task.result()
+                    else:
+                        task.result()[1].close()
+                        slots.done(candidate)
+                else:
+                    errors.append(task.exception())
+                    if on_failure is not None:
+                        on_failure(task.exception())
+                    # Replaces the failed request, so it fits in the slots held
+                    if waiting and slots.take(waiting[0]):
+                        timeout = launch(waiting[0])
+            if winner is not None:
+                return winner
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    raise AllCandidatesFailed(errors)
+
+
+def open_first(candidates, delay=None, on_failure=None):
+    """Blocking wrapper around `race`, skipping endpoints known to be down"""
+    return asyncio.run(race(healthy_first(candidates), delay, on_failure))
+
+
+def stream_text(candidate, response, usage=None):
+    """Yield the text of a winning response, chunk by chunk.
+
+    If given, the `usage` dict gets the tokens_in/tokens_out the provider
+    reports in the stream.
+    """
+    try:
+        for event in iter_sse_json(response):
+            if usage is not None and candidate.usage is not None:
+                tokens = candidate.usage(event)
+                if tokens:
+                    usage["tokens_in"], usage["tokens_out"] = tokens
+            text = candidate.extract(event)
+            if text:
+                yield text
+    finally:
+        response.close()
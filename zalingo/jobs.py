@@ -0,0 +1,153 @@
+# ============================================
+# BACKGROUND JOB ENGINE
+# ============================================
+# Summaries run on a process-wide thread pool instead of inside the
+# Streamlit script run. The page stores the job ID in st.session_state
+# and polls: a widget change (which reruns the script) just reattaches to
+# the running job instead of losing it or starting it again.
+#
+# A job reports back through its own fields - status messages, a stage
+# label, its place in the queue for a busy API key, the partially
+# streamed text and (for batches) how many summaries are done - which the
+# page renders on every poll. Jobs never touch Streamlit themselves.
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from . import settings
+from .streaming import TimedStream
+
+
+@dataclass
+class Job:
+    id: str
+    key: str = None
+    status: str = "queued"          # queued -> running -> done | failed
+    stage: str = "Waiting for a free worker..."
+    messages: list = field(default_factory=list)
+    partial: str = ""
+    queue: tuple = None             # (position, estimated seconds) while waiting for the API key
+    progress: tuple = None          # (done, total) for jobs made of many summaries
+    result: object = None
+    error: str = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def elapsed(self):
+        return (self.finished_at or time.time()) - (self.started_at or self.created_at)
+
+    def notify(self, level, message):
+        """Provider `notify` callback: keep the message for the page to show.
+
+        Every chunk and fan-out call reports e.g. the model it used, so a
+        message the job already has isn't kept again.
+        """
+        if (level, message) not in self.messages:
+            self.messages.append((level, message))
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def set_progress(self, done, total, message=None):
+        """Batch `on_progress` callback"""
+        self.progress = (done, total)
+        if message:
+            self.stage = message
+
+    def set_queue(self, position, eta):
+        """Scheduler `on_wait` callback; (None, None) once the call runs"""
+        self.queue = None if position is None else (position, eta)
+
+    def consume_stream(self, chunks):
+        """`on_stream` callback: expose streamed text as `partial` while it arrives"""
+        self.partial = ""
+        stream = TimedStream(chunks)
+        for _ in stream:
+            self.partial = stream.text
+        return stream
+
+
+def _has_summary(job):
+    """True if a finished job has every summary it was asked for"""
+    result = job.result if job.status == "done" else None
+    if not isinstance(result, dict):
+        return False
+    if result.get("summaries"):
+        return all(result["summaries"].values())
+    return bool(result.get("summary"))
+
+
+class JobQueue:
+    """Runs `fn(job, *args)` on a thread pool and keeps the Job for polling"""
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zalingo-job")
+        self.jobs = {}
+        self.by_key = {}
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, key=None):
+        """Start a job and return its ID.
+
+        If an unfinished job with the same `key` exists, or one that
+        produced its summaries, its ID is returned instead, so a double
+        click doesn't do the work twice. After a failure (including
+        provider calls that gave no summary) the work is started again.
+        """
+        with self.lock:
+            self._prune()
+            existing = self.jobs.get(self.by_key.get(key)) if key else None
+            if existing is not None and (not existing.finished or _has_summary(existing)):
+                return existing.id
+
+            job = Job(id=uuid.uuid4().hex, key=key)
+            self.jobs[job.id] = job
+            if key:
+                self.by_key[key] = job.id
+
+        self.executor.submit(self._run, job, fn, args)
+        return job.id
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, fn, args):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - settings.JOB_TTL
+        for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished_at < cutoff]:
+            job = self.jobs.pop(job_id)
+            if job.key and self.by_key.get(job.key) == job_id:
+                del self.by_key[job.key]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """The process-wide JobQueue (survives Streamlit reruns)"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(settings.JOB_WORKERS)
+        return _queue
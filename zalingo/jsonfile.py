@@ -0,0 +1,38 @@
+# ============================================
+# JSON FILE HELPERS
+# ============================================
+# Small best-effort persistence used by the on-disk caches. Writes go
+# through a temp file + os.replace so a crash never leaves half a file.
+
+import json
+import os
+import tempfile
+
+
+def load_json(path, default):
+    """Read a JSON file, returning `default` if it is missing or corrupt"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    """Atomically write `data` as JSON. Returns False if the write failed."""
+    directory = os.path.dirname(path) or "."
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
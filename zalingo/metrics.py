@@ -0,0 +1,223 @@
+# ============================================
+# PIPELINE INSTRUMENTATION
+# ============================================
+# Where did the time go? Every stage of a summary - PDF extraction, prompt
+# translation, model resolution, each provider call - records a span with
+# its wall time and whatever else it knows (bytes, token usage reported
+# by the provider, the model used). Cache lookups and HTTP retries are
+# counted alongside.
+#
+# Spans are collected into the Trace of the current summary, found through
+# a context variable so the deep helpers (transport, providers) don't need
+# an extra parameter. Worker threads get it by running their task in a
+# copy of the submitting thread's context (see `in_context`).
+#
+# Everything is also added to process-wide totals. When a trace finishes
+# it is appended to CACHE_DIR/traces.jsonl (rotated to traces.jsonl.1 at
+# settings.TRACES_MAX_BYTES) and the totals are rewritten as Prometheus
+# text to CACHE_DIR/metrics.prom (node-exporter textfile format). Set
+# ZALINGO_METRICS=0 to skip the files.
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+
+from . import settings
+
+_current = contextvars.ContextVar("zalingo_trace", default=None)
+_totals = {}
+_lock = threading.Lock()
+
+# Prometheus metric name -> help text
+METRICS = {
+    "zalingo_stage_seconds_total": "Wall time spent per pipeline stage",
+    "zalingo_stage_calls_total": "Number of times each pipeline stage ran",
+    "zalingo_stage_bytes_total": "Bytes handled per pipeline stage",
+    "zalingo_tokens_total": "Tokens reported by the providers",
+    "zalingo_cache_requests_total": "Cache lookups by cache and result",
+    "zalingo_http_retries_total": "Provider HTTP requests that were retried",
+    "zalingo_traces_total": "Finished summary traces",
+}
+
+
+@dataclass
+class Span:
+    stage: str
+    start: float                # seconds since the trace started
+    seconds: float
+    attrs: dict = field(default_factory=dict)
+
+
+class Trace:
+    """Spans and counters for one summary request"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.seconds = None
+        self.spans = []
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, start, seconds, attrs):
+        with self.lock:
+            self.spans.append(Span(stage, start - self.started_at, seconds, attrs))
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def stage_totals(self):
+        """{stage: (calls, seconds)} in order of first appearance"""
+        totals = {}
+        with self.lock:
+            for span in self.spans:
+                calls, seconds = totals.get(span.stage, (0, 0.0))
+                totals[span.stage] = (calls + 1, seconds + span.seconds)
+        return totals
+
+    def tokens(self):
+        """(input, output) tokens over all provider calls"""
+        with self.lock:
+            return (
+                sum(s.attrs.get("tokens_in") or 0 for s in self.spans),
+                sum(s.attrs.get("tokens_out") or 0 for s in self.spans),
+            )
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "name": self.name,
+                "started_at": self.started_at,
+                "seconds": self.seconds,
+                "spans": [asdict(s) for s in self.spans],
+                "counters": dict(self.counters),
+            }
+
+
+def current():
+    """The Trace being recorded in this context, or None"""
+    return _current.get()
+
+
+def in_context(fn):
+    """Wrap `fn` to run in a copy of the caller's context (for thread pools)"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def _inc(metric, labels, value=1):
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        _totals[key] = _totals.get(key, 0) + value
+
+
+# ============================================
+# RECORDING
+# ============================================
+
+def record(stage, seconds, start=None, **attrs):
+    """Record a finished stage. Known attrs: bytes, tokens_in, tokens_out, provider"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, start if start is not None else time.time() - seconds, seconds, attrs)
+
+    _inc("zalingo_stage_seconds_total", {"stage": stage}, seconds)
+    _inc("zalingo_stage_calls_total", {"stage": stage})
+    if attrs.get("bytes"):
+        _inc("zalingo_stage_bytes_total", {"stage": stage}, attrs["bytes"])
+    provider = attrs.get("provider", "unknown")
+    for direction in ("in", "out"):
+        if attrs.get(f"tokens_{direction}"):
+            _inc("zalingo_tokens_total", {"provider": provider, "direction": direction}, attrs[f"tokens_{direction}"])
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Time a block as `stage`; the yielded dict takes attributes learned inside it"""
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        record(stage, time.perf_counter() - started, start, **attrs)
+
+
+def count_cache(cache, hit):
+    """Count one lookup in `cache` ("summary", "near_duplicate", "document", "chunk", "prompt", "model")"""
+    result = "hit" if hit else "miss"
+    trace = _current.get()
+    if trace is not None:
+        trace.count(f"{cache}_cache_{result}")
+    _inc("zalingo_cache_requests_total", {"cache": cache, "result": result})
+
+
+def count_retry(provider):
+    trace = _current.get()
+    if trace is not None:
+        trace.count("http_retries")
+    _inc("zalingo_http_retries_total", {"provider": provider})
+
+
+@contextmanager
+def tracing(name):
+    """Collect everything recorded inside the block into a new Trace, then export it"""
+    trace = Trace(name)
+    token = _current.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.seconds = time.perf_counter() - started
+        _current.reset(token)
+        _inc("zalingo_traces_total", {"name": name})
+        if settings.METRICS_EXPORT:
+            export(trace)
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def prometheus_text():
+    """The process-wide totals in Prometheus text exposition format"""
+    with _lock:
+        items = sorted(_totals.items())
+    lines = []
+    for metric, help_text in METRICS.items():
+        samples = [(labels, value) for (name, labels), value in items if name == metric]
+        if not samples:
+            continue
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:g}" if label_text else f"{metric} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def export(trace):
+    """Append `trace` to traces.jsonl and refresh metrics.prom (best effort)"""
+    try:
+        with _lock:
+            traces_path = settings.cache_path("traces.jsonl")
+            if os.path.exists(traces_path) and os.path.getsize(traces_path) >= settings.TRACES_MAX_BYTES:
+                os.replace(traces_path, f"{traces_path}.1")
+            with open(traces_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+
+        path = settings.cache_path("metrics.prom")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
@@ -0,0 +1,95 @@
+# ============================================
+# MODEL RESOLUTION CACHE
+# ============================================
+# Remembers which model answered for a given (provider, API key) so we
+# don't burn requests probing the candidate list on every summary.
+# Entries live in-process and in CACHE_DIR/models.json, expire after
+# settings.MODEL_CACHE_TTL seconds and are dropped as soon as a real call
+# on the cached model fails. API keys are only ever stored hashed.
+
+import hashlib
+import threading
+import time
+
+from . import metrics, settings
+from .jsonfile import load_json, save_json
+
+_lock = threading.Lock()
+_entries = None
+
+
+def _entry_key(provider, api_key):
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return f"{provider}:{digest}"
+
+
+def _load():
+    global _entries
+    if _entries is None:
+        _entries = load_json(settings.cache_path("models.json"), {})
+    return _entries
+
+
+def _save():
+    save_json(settings.cache_path("models.json"), _entries)
+
+
+def get_cached_model(provider, api_key):
+    """Return the remembered model for this key, or None if unknown/expired"""
+    key = _entry_key(provider, api_key)
+    with _lock:
+        entries = _load()
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.get("saved_at", 0) > settings.MODEL_CACHE_TTL:
+            del entries[key]
+            _save()
+            return None
+        return entry.get("model")
+
+
+def remember_model(provider, api_key, model):
+    """Record `model` as the working model for this key"""
+    with _lock:
+        _load()[_entry_key(provider, api_key)] = {"model": model, "saved_at": time.time()}
+        _save()
+
+
+def forget_model(provider, api_key):
+    """Drop the remembered model, e.g. after a call on it failed"""
+    with _lock:
+        if _load().pop(_entry_key(provider, api_key), None) is not None:
+            _save()
+
+
+def ordered_candidates(provider, api_key, candidates):
+    """Return `candidates` with the remembered model (if any) moved to the front"""
+    cached = get_cached_model(provider, api_key)
+    if cached in candidates:
+        return [cached] + [c for c in candidates if c != cached]
+    return list(candidates)
+
+
+def resolve_model(provider, api_key, candidates, probe):
+    """Return a working model name, calling `probe` only on a cache miss.
+
+    `probe(candidate)` should raise if the candidate can't be used. The
+    first candidate that passes is remembered; None means none worked.
+    """
+    with metrics.span("model_resolution", provider=provider) as span:
+        cached = get_cached_model(provider, api_key)
+        metrics.count_cache("model", cached in candidates)
+        if cached in candidates:
+            span["model"] = cached
+            return cached
+
+        for candidate in candidates:
+            try:
+                probe(candidate)
+            except Exception:
+                continue
+            remember_model(provider, api_key, candidate)
+            span["model"] = candidate
+            return candidate
+        return None
@@ -0,0 +1,135 @@
+# ============================================
+# ONE SUMMARY, MANY LANGUAGES
+# ============================================
+# Summarizing a paper in all 10 languages used to mean 10 long-context
+# calls. Here the paper is summarized once in English (the pivot), and
+# the short pivot summary is translated into the other languages
+# concurrently, either with small provider calls or with GoogleTranslator.
+# Every translated summary is cached per language, under the model that
+# wrote the pivot and the one that translated it, so the expensive
+# full-paper call happens once per paper and settings.
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import budget, metrics
+from .pipeline import PROVIDER_CALLS, model_ids, summarize_document
+from .prompts import language_codes, translate, translator_supports
+from .providers import answered_by, log_notify
+from .summary_cache import text_digest, summary_key, get_summary, put_summary
+
+PIVOT_LANGUAGE = "English"
+
+TRANSLATE_PROMPT = (
+    "Translate the summary given after 'PAPER TEXT:' into {language}. "
+    "Keep the structure (paragraphs, headings, bullet points) and any numbers. "
+    "Reply with the translation only."
+)
+
+# GoogleTranslator rejects requests over 5000 characters
+TRANSLATOR_MAX_CHARS = 4500
+
+FAN_OUT_WORKERS = 4
+
+# Cache id of translations made by GoogleTranslator, next to the model_ids
+# of translations made by a provider
+TRANSLATOR_ID = "translator/google"
+
+
+def _split_for_translator(text):
+    """Paragraph-sized pieces under the translator's request limit"""
+    pieces, current = [], ""
+    for paragraph in text.split("\n"):
+        while len(paragraph) > TRANSLATOR_MAX_CHARS:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(paragraph[:TRANSLATOR_MAX_CHARS])
+            paragraph = paragraph[TRANSLATOR_MAX_CHARS:]
+        if current and len(current) + 1 + len(paragraph) > TRANSLATOR_MAX_CHARS:
+            pieces.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def translate_with_translator(text, language):
+    pieces = _split_for_translator(text)
+    with metrics.span("summary_translation", language=language, bytes=len(text)):
+        translated = translate(pieces, language_codes[language])
+    if not all(translated):
+        return None
+    return "\n".join(translated)
+
+
+def translate_with_provider(text, language, api_key, provider, notify=log_notify):
+    call_fn, _ = PROVIDER_CALLS[provider]
+    return call_fn(api_key, TRANSLATE_PROMPT.format(language=language), text, notify,
+                   output_tokens=budget.translation_output_tokens(text, language))
+
+
+def summarize_in_languages(doc, api_key, provider, summary_type, summary_length, languages,
+                           method="provider", force_refresh=False, notify=log_notify,
+                           initializer=None, on_split=None, backup_key=None):
+    """Summarize once in English, then fan out to `languages`.
+
+    `method` is "provider" (short LLM call per language) or "translator"
+    (GoogleTranslator, falling back to the provider if it fails).
+    `backup_key` is passed on to the English summary.
+    Returns {language: summary or None} in the order of `languages`.
+    """
+    with answered_by() as pivot_answers:
+        pivot, _, _ = summarize_document(
+            doc, api_key, provider, summary_type, summary_length, PIVOT_LANGUAGE,
+            force_refresh=force_refresh, notify=notify,
+            initializer=initializer, on_split=on_split, backup_key=backup_key
+        )
+    if not pivot:
+        return {language: None for language in languages}
+
+    results = {PIVOT_LANGUAGE: pivot}
+    paper_digest = text_digest(doc.text)
+    # Translations are cached under the model that translated and the one
+    # that wrote the pivot, so e.g. a Mistral backup answer is never served
+    # as a Gemini one. Separate from directly generated summaries.
+    pivot_model = pivot_answers[-1] if pivot_answers else None
+    translators = model_ids(provider)
+    if method == "translator":
+        translators = [TRANSLATOR_ID] + translators
+
+    def cache_key(language, translator):
+        via = f"{translator}|via-{language_codes[PIVOT_LANGUAGE]}|{pivot_model}"
+        return summary_key(paper_digest, summary_type, summary_length, language, via)
+
+    def fan_out(language):
+        if pivot_model and not force_refresh:
+            for translator in translators:
+                cached = get_summary(cache_key(language, translator))
+                if cached:
+                    return cached
+
+        translated = None
+        if method == "translator" and translator_supports(language_codes[language]):
+            try:
+                translated = translate_with_translator(pivot, language)
+                translator = TRANSLATOR_ID
+            except Exception as e:
+                notify("warning", f"Translator failed for {language} ({e}), using the AI provider instead")
+        if not translated:
+            with answered_by() as answers:
+                translated = translate_with_provider(pivot, language, api_key, provider, notify)
+            translator = answers[-1] if answers else None
+
+        if translated and pivot_model and translator:
+            put_summary(cache_key(language, translator), translated)
+        return translated
+
+    targets = [l for l in languages if l != PIVOT_LANGUAGE]
+    if targets:
+        with ThreadPoolExecutor(max_workers=min(FAN_OUT_WORKERS, len(targets)), initializer=initializer) as pool:
+            for language, translated in zip(targets, pool.map(metrics.in_context(fan_out), targets)):
+                results[language] = translated
+
+    return {language: results.get(language) for language in languages}
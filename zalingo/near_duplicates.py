@@ -0,0 +1,192 @@
+# ============================================
+# NEAR-DUPLICATE PAPERS
+# ============================================
+# Students upload slightly different copies of the same paper: arXiv v1
+# and v2, the publisher PDF and the preprint, a copy with another cover
+# page. Their text hashes differ, so the summary cache misses all of them.
+#
+# Every summarized paper gets a MinHash signature of its word 5-grams
+# ("shingles"). Each shingle is hashed once and lands in one of
+# SIGNATURE_SIZE bins, which keep their smallest hash (one-permutation
+# hashing; empty bins borrow from the next full one). The share of equal
+# bins in two signatures estimates the Jaccard similarity of the papers.
+#
+# Lookups use locality-sensitive hashing: the signature is cut into BANDS
+# bands, and each band's hash is stored in an indexed SQLite table
+# (CACHE_DIR/near_duplicates.sqlite3). Only papers that share a band
+# bucket are compared, so a lookup is a few index reads however many
+# papers are stored. With 16 bands of 8 rows, a paper that is 85% the
+# same is found 99% of the time, and one that is 50% the same only 6%.
+
+import hashlib
+import re
+import sqlite3
+import struct
+import threading
+import time
+from dataclasses import dataclass
+
+from . import settings
+from .summary_cache import normalize_text
+
+SHINGLE_WORDS = 5
+SIGNATURE_SIZE = 128
+BANDS = 16
+ROWS = SIGNATURE_SIZE // BANDS
+
+# Bin values are the high bits of a 64-bit hash; a borrowed value is
+# offset by BIN_SPAN per bin it was borrowed across, so it can't match
+# a real one
+BIN_SPAN = 1 << 57
+_EMPTY = BIN_SPAN
+
+_WORD_RE = re.compile(r"\w+")
+
+_lock = threading.Lock()
+_conn = None
+
+
+@dataclass
+class Match:
+    digest: str                     # text digest of the stored paper
+    similarity: float               # estimated Jaccard similarity, 0..1
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(
+            settings.cache_path("near_duplicates.sqlite3"),
+            timeout=10,
+            check_same_thread=False
+        )
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS papers (
+                digest TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                added_at REAL NOT NULL
+            )
+        """)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (band, bucket, digest)
+            ) WITHOUT ROWID
+        """)
+        _conn.commit()
+    return _conn
+
+
+# ============================================
+# SIGNATURES
+# ============================================
+
+def _hash64(data, signed=False):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big", signed=signed)
+
+
+def signature(text):
+    """MinHash signature of `text` (a tuple of SIGNATURE_SIZE ints), or None if it is too short"""
+    words = _WORD_RE.findall(normalize_text(text).lower())
+    if len(words) < SHINGLE_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+    bins = [_EMPTY] * SIGNATURE_SIZE
+    for shingle in shingles:
+        h = _hash64(shingle.encode("utf-8"))
+        slot, value = h % SIGNATURE_SIZE, h // SIGNATURE_SIZE
+        if value < bins[slot]:
+            bins[slot] = value
+
+    # Short texts leave bins empty: fill each from the next full bin
+    # (wrapping around), so equal texts still get equal signatures
+    filled = list(bins)
+    for i, value in enumerate(bins):
+        distance = 1
+        while value == _EMPTY:
+            value = bins[(i + distance) % SIGNATURE_SIZE]
+            if value != _EMPTY:
+                value += distance * BIN_SPAN
+            distance += 1
+        filled[i] = value
+    return tuple(filled)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / SIGNATURE_SIZE
+
+
+def _buckets(sig):
+    """(band, bucket) for every band of a signature"""
+    return [
+        (band, _hash64(struct.pack(f">{ROWS}Q", *sig[band * ROWS:(band + 1) * ROWS]), signed=True))
+        for band in range(BANDS)
+    ]
+
+
+# ============================================
+# INDEX
+# ============================================
+
+def add(digest, sig):
+    """Index the paper with text digest `digest`"""
+    if sig is None:
+        return
+    with _lock:
+        try:
+            conn = _connect()
+            conn.execute(
+                "INSERT OR IGNORE INTO papers (digest, signature, added_at) VALUES (?, ?, ?)",
+                (digest, struct.pack(f">{SIGNATURE_SIZE}Q", *sig), time.time())
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO bands VALUES (?, ?, ?)",
+                [(band, bucket, digest) for band, bucket in _buckets(sig)]
+            )
+            conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+def find(sig, exclude=None, threshold=None):
+    """The most similar indexed paper at or over `threshold`, or None.
+
+    `exclude` is a text digest to skip (the paper itself). The threshold
+    defaults to settings.NEAR_DUPLICATE_THRESHOLD; 0 turns lookups off.
+    """
+    threshold = settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+    if sig is None or threshold <= 0:
+        return None
+    candidates = " UNION ".join(["SELECT digest FROM bands WHERE band = ? AND bucket = ?"] * BANDS)
+    params = [value for pair in _buckets(sig) for value in pair]
+    with _lock:
+        try:
+            rows = _connect().execute(
+                f"SELECT digest, signature FROM papers WHERE digest IN ({candidates})", params
+            ).fetchall()
+        except sqlite3.Error:
+            return None
+
+    best = None
+    for digest, blob in rows:
+        if digest == exclude:
+            continue
+        score = similarity(sig, struct.unpack(f">{SIGNATURE_SIZE}Q", blob))
+        if score >= threshold and (best is None or score > best.similarity):
+            best = Match(digest, score)
+    return best
+
+
+def contains(digest):
+    """True if the paper with text digest `digest` is indexed"""
+    with _lock:
+        try:
+            return _connect().execute("SELECT 1 FROM papers WHERE digest = ?", (digest,)).fetchone() is not None
+        except sqlite3.Error:
+            return False
+
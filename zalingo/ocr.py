@@ -0,0 +1,134 @@
+# ============================================
+# OCR FOR SCANNED PAGES (OPTIONAL)
+# ============================================
+# Pages where neither PyPDF2 nor pdfplumber finds a text layer are
+# rendered with pypdfium2 and read with Tesseract (via pytesseract). All
+# three are optional: without them scanned pages simply stay empty, as
+# before. They are only imported once a scanned page turns up.
+#
+# OCR is orders of magnitude slower than text extraction, so results are
+# cached per page (kind "ocr" in the summary cache, never evicted), keyed
+# on a hash of what the page draws - its content stream and the image
+# data it uses - plus the OCR settings. The same scan inside a different
+# file, or re-uploaded under another name, is never OCRed twice.
+#
+# The scheduling across the extraction process pool lives in
+# zalingo/extraction.py; this module only knows how to read one page.
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from . import settings, summary_cache
+
+logger = logging.getLogger(__name__)
+
+_available = None
+_lock = threading.Lock()
+
+
+def available():
+    """True if OCR is enabled and pytesseract, pypdfium2 and tesseract are installed"""
+    global _available
+    with _lock:
+        if _available is None:
+            _available = False
+            if settings.OCR_MODE == "0":
+                return False
+            try:
+                import pypdfium2  # noqa: F401
+                import pytesseract
+            except ImportError:
+                logger.info("OCR disabled: install pytesseract and pypdfium2 to read scanned PDFs")
+                return False
+            try:
+                pytesseract.get_tesseract_version()
+                _available = True
+            except Exception:
+                logger.info("OCR disabled: the tesseract program was not found")
+        return _available
+
+
+# ============================================
+# PAGE IDENTITY
+# ============================================
+
+def _stream_bytes(obj):
+    try:
+        return obj.get_data()
+    except Exception:
+        return getattr(obj, "_data", b"") or b""
+
+
+def _hash_resources(resources, digest, depth=0):
+    """Feed every XObject (images, and forms recursively) into `digest`"""
+    if resources is None or depth > 3:
+        return
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return
+    xobjects = xobjects.get_object()
+    for name in sorted(xobjects):
+        xobject = xobjects[name].get_object()
+        digest.update(str(name).encode("utf-8"))
+        digest.update(str(xobject.get("/Subtype")).encode("utf-8"))
+        digest.update(_stream_bytes(xobject))
+        if xobject.get("/Subtype") == "/Form":
+            _hash_resources(xobject.get("/Resources"), digest, depth + 1)
+
+
+def page_digest(page):
+    """Hash of what a PyPDF2 page draws (independent of the rest of the file)"""
+    digest = hashlib.sha256()
+    digest.update(str(page.mediabox).encode("utf-8"))
+    digest.update(str(page.get("/Rotate", 0)).encode("utf-8"))
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(_stream_bytes(contents))
+    _hash_resources(page.get("/Resources"), digest)
+    return digest.hexdigest()
+
+
+# ============================================
+# CACHE
+# ============================================
+
+def _cache_key(digest):
+    return f"{digest}|{settings.OCR_LANGUAGES}|{settings.OCR_DPI:g}"
+
+
+def cached_text(digest):
+    """OCR text previously read for a page with this digest, or None"""
+    return summary_cache.get("ocr", _cache_key(digest))
+
+
+def store_text(digest, text):
+    summary_cache.put("ocr", _cache_key(digest), text)
+
+
+# ============================================
+# READING ONE PAGE
+# ============================================
+
+def ocr_page(source, index):
+    """Render page `index` of a PDF (path or bytes) and OCR it; returns (text, seconds)"""
+    import pypdfium2
+    import pytesseract
+
+    started = time.perf_counter()
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        page = pdf[index]
+        try:
+            image = page.render(scale=settings.OCR_DPI / 72).to_pil()
+        finally:
+            page.close()
+    finally:
+        pdf.close()
+
+    # Parallelism comes from the process pool; one thread per Tesseract run
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    text = pytesseract.image_to_string(image, lang=settings.OCR_LANGUAGES)
+    return text, time.perf_counter() - started
@@ -0,0 +1,299 @@
+# ============================================
+# SUMMARIZATION PIPELINE
+# ============================================
+# The UI-free core shared by the Streamlit app, the background job engine
+# and the batch runner: PDF extraction and cached document loading, then
+# prompt -> (map-reduce) provider call -> summary cache.
+
+import dataclasses
+import functools
+import hashlib
+import os
+from dataclasses import dataclass
+
+from . import budget, metrics, near_duplicates, scheduler
+from .chunking import map_reduce_summarize
+from .doc_index import build_index
+from .extraction import extract_pages, budget_for
+from .prompts import get_prompt, language_codes
+from .spool import path_digest, spooled, upload_digest
+from .providers import (
+    GEMINI_REST_ENDPOINTS, GEMINI_SDK_MODELS, MISTRAL_MODEL, answered_by, log_notify, model_id, record_answer,
+    call_gemini_api, call_mistral_api, stream_gemini_api, stream_mistral_api,
+)
+from .streaming import TimedStream
+from .summary_cache import (
+    file_digest, text_digest, summary_key,
+    get_summary, put_summary, get_document, put_document,
+)
+
+# provider -> (blocking call, streaming call)
+PROVIDER_CALLS = {
+    "gemini": (call_gemini_api, stream_gemini_api),
+    "mistral": (call_mistral_api, stream_mistral_api),
+}
+
+
+def model_ids(provider):
+    """Every model_id whose cached answers serve a request to `provider`"""
+    if provider == "mistral":
+        return [model_id("mistral", MISTRAL_MODEL)]
+    return list(dict.fromkeys(model_id("gemini", m) for m in GEMINI_SDK_MODELS + GEMINI_REST_ENDPOINTS))
+
+
+def _cached_summary(digest, summary_type, summary_length, language, provider):
+    """(summary, model_id) of a cached summary of the paper with text digest
+    `digest` by any of `provider`'s models, or (None, None)"""
+    for model in model_ids(provider):
+        cached = get_summary(summary_key(digest, summary_type, summary_length, language, model))
+        if cached:
+            return cached, model
+    return None, None
+
+
+# ============================================
+# PDF EXTRACTION
+# ============================================
+
+def extract_text_from_pdf(pdf_file, char_budget=None):
+    """Extract the paper page by page and index its sections and references.
+
+    Stops once `char_budget` characters have been read (None = all pages).
+    Large PDFs are extracted across a process pool. `pdf_file` may be a
+    spooled file path (see zalingo/spool.py).
+    """
+    with metrics.span("extraction") as span:
+        results, complete = extract_pages(pdf_file, char_budget)
+        span["pages"] = len(results)
+        if isinstance(pdf_file, str):
+            span["bytes"] = os.path.getsize(pdf_file)
+        else:
+            span["bytes"] = len(pdf_file) if isinstance(pdf_file, bytes) else getattr(pdf_file, "size", None)
+
+    with metrics.span("indexing"):
+        doc = build_index([r.text for r in results])
+    # The text lives in doc.pages/doc.text; the stats only need its length
+    doc.page_stats = [dataclasses.replace(r, text="") for r in results]
+    doc.complete = complete
+    return doc
+
+
+def load_document(data, char_budget=None, force_refresh=False):
+    """DocumentIndex for raw PDF bytes (or a spooled file path), reusing cached page texts"""
+    digest = path_digest(data) if isinstance(data, str) else file_digest(data)
+    pages = None if force_refresh else get_document(digest)
+    metrics.count_cache("document", pages is not None)
+    if pages is not None:
+        with metrics.span("indexing"):
+            return build_index(pages)
+
+    doc = extract_text_from_pdf(data, char_budget)
+    # Only full extractions are reusable by every summary type
+    if doc.complete and len(doc.text) >= 100:
+        put_document(digest, doc.pages)
+    return doc
+
+
+# ============================================
+# SUMMARIES
+# ============================================
+
+def summarize_document(doc, api_key, provider, summary_type, summary_length, language,
+                       force_refresh=False, notify=log_notify, on_stream=None,
+                       initializer=None, on_split=None, backup_key=None):
+    """Summarize a DocumentIndex; returns (summary, cache_hit, first_token_seconds).
+
+    `provider` is "gemini" or "mistral". Only the sections the summary
+    type needs are sent, and never the References section. If `on_stream`
+    is given, the final provider call streams and `on_stream(chunks)` must
+    consume the chunks and return the TimedStream it used (see
+    consume_stream). `initializer` and `on_split` are passed on to the
+    map-reduce step. `backup_key` is a Mistral key raced against Gemini
+    when its models fail (see zalingo/hedging.py).
+
+    Another version of an already summarized paper (see
+    zalingo/near_duplicates.py) reuses that paper's summary, unless this
+    version has been summarized on its own before.
+
+    The model that wrote the returned summary, cached or not, is reported
+    to an enclosing answered_by block (see zalingo/providers.py).
+    """
+    digest = text_digest(doc.text)
+
+    if not force_refresh:
+        cached, model = _cached_summary(digest, summary_type, summary_length, language, provider)
+        metrics.count_cache("summary", bool(cached))
+        if cached:
+            record_answer(model)
+            return cached, True, None
+
+    with metrics.span("near_duplicates"):
+        signature = near_duplicates.signature(doc.text)
+        # A version that was summarized on its own (e.g. with Force refresh)
+        # keeps getting its own summaries
+        match = None
+        if not force_refresh and not near_duplicates.contains(digest):
+            match = near_duplicates.find(signature, exclude=digest)
+    if match:
+        cached, model = _cached_summary(match.digest, summary_type, summary_length, language, provider)
+        metrics.count_cache("near_duplicate", bool(cached))
+        if cached:
+            record_answer(model)
+            notify("info", f"♻️ This looks like another version or copy of a paper summarized before "
+                           f"({match.similarity:.0%} match), so its summary is reused. Tick Force refresh "
+                           f"to summarize this copy.")
+            return cached, True, None
+
+    # Served from the local prompt-translation table after the first use
+    with metrics.span("prompt", language=language):
+        translated_prompt = get_prompt(summary_type, summary_length, language)
+
+    call_fn, stream_fn = PROVIDER_CALLS[provider]
+    if provider == "gemini" and backup_key:
+        call_fn = functools.partial(call_fn, backup_key=backup_key)
+        stream_fn = functools.partial(stream_fn, backup_key=backup_key)
+    call = lambda prompt, text: call_fn(api_key, prompt, text, notify)
+
+    # Only the call that writes the summary needs room for the requested length
+    output_tokens = budget.output_tokens(summary_length, language)
+
+    timing = {}
+    if on_stream is not None:
+        def final_call(prompt, text):
+            stream = on_stream(stream_fn(api_key, prompt, text, notify, output_tokens=output_tokens))
+            timing["first_token"] = stream.first_token_seconds
+            return stream.text or None
+    else:
+        def final_call(prompt, text):
+            return call_fn(api_key, prompt, text, notify, output_tokens=output_tokens)
+
+    # Long papers are summarized part by part, then combined
+    with answered_by() as answers:
+        summary = map_reduce_summarize(
+            doc.text_for(summary_type), translated_prompt, call, provider, model_ids(provider),
+            initializer=initializer,
+            on_split=on_split,
+            final_call=final_call
+        )
+
+    if summary:
+        # Cached under the model that wrote it, so e.g. an answer from the
+        # Mistral backup is never served as a Gemini summary
+        if answers:
+            put_summary(summary_key(digest, summary_type, summary_length, language, answers[-1]), summary)
+            record_answer(answers[-1])
+        near_duplicates.add(digest, signature)
+    return summary, False, timing.get("first_token")
+
+
+def consume_stream(chunks):
+    """on_stream callback that just collects the text (no live display)"""
+    stream = TimedStream(chunks)
+    for _ in stream:
+        pass
+    return stream
+
+
+# ============================================
+# ONE SUMMARY REQUEST (RUN AS A BACKGROUND JOB)
+# ============================================
+
+@dataclass
+class SummaryRequest:
+    """Everything a summary needs, captured when the user clicks the button"""
+    api_key: str
+    provider: str                   # "gemini" or "mistral"
+    summary_type: str
+    summary_length: str
+    language: str
+    pdf_bytes: bytes = None         # either a PDF...
+    pdf_file: object = None         # ...or a PDF upload (binary file object)...
+    text: str = None                # ...or pasted text
+    force_refresh: bool = False
+    stream: bool = True
+    all_languages: bool = False
+    fan_out_method: str = "provider"
+    backup_key: str = None          # Mistral key raced when Gemini is down
+    session: str = "default"        # who is asking, for fair scheduling per API key
+
+    def is_short(self):
+        """Quick requests that go in the scheduler's priority lane"""
+        return self.summary_type == "Abstract only" or self.summary_length == "Short"
+
+    def job_key(self):
+        """Identical requests share a job; forced refreshes always start a new one"""
+        if self.force_refresh:
+            return None
+        if self.pdf_file is not None:
+            content_digest = upload_digest(self.pdf_file)
+        else:
+            content = self.pdf_bytes if self.pdf_bytes is not None else (self.text or "").encode("utf-8")
+            content_digest = hashlib.sha256(content).hexdigest()
+        parts = [
+            content_digest,
+            hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16],
+            self.provider, self.summary_type, self.summary_length, self.language,
+            str(self.all_languages), self.fan_out_method,
+        ]
+        return "|".join(parts)
+
+
+def run_summary_request(job, request):
+    """Job body: extract (or index the pasted text) and summarize.
+
+    Returns a dict with the DocumentIndex and either `summary` (plus
+    `cache_hit` and `first_token`) or, in all-languages mode, `summaries`,
+    and the metrics Trace of the run under `trace`. Provider calls are
+    scheduled for `request.session`, and `job.queue` shows where they
+    wait.
+    """
+    result = {"request": request, "doc": None, "summary": None, "summaries": None,
+              "cache_hit": False, "first_token": None, "trace": None}
+    with metrics.tracing("summary") as trace, \
+            scheduler.requester(request.session, priority=request.is_short(), on_wait=job.set_queue):
+        result["trace"] = trace
+        _run_request(job, request, result)
+    return result
+
+
+def _run_request(job, request, result):
+    is_pdf = request.pdf_bytes is not None or request.pdf_file is not None
+    if request.pdf_file is not None:
+        job.set_stage("📖 Reading PDF...")
+        # Large uploads go to a temp file for the extraction and are then dropped
+        with spooled(request.pdf_file) as source:
+            request.pdf_file = None
+            doc = load_document(source, budget_for(request.summary_type), request.force_refresh)
+    elif request.pdf_bytes is not None:
+        job.set_stage("📖 Reading PDF...")
+        doc = load_document(request.pdf_bytes, budget_for(request.summary_type), request.force_refresh)
+    else:
+        with metrics.span("indexing", bytes=len(request.text)):
+            doc = build_index([request.text])
+    result["doc"] = doc
+    if is_pdf and len(doc.text) < 100:
+        return
+
+    job.set_stage("🤖 Generating summary...")
+    on_split = lambda n: job.notify("info", f"📑 Long paper: summarizing it in {n} parts, then combining...")
+
+    if request.all_languages:
+        # Imported here: multilang builds on this module
+        from .multilang import summarize_in_languages
+        result["summaries"] = summarize_in_languages(
+            doc, request.api_key, request.provider, request.summary_type, request.summary_length,
+            list(language_codes), method=request.fan_out_method,
+            force_refresh=request.force_refresh, notify=job.notify, on_split=on_split,
+            backup_key=request.backup_key
+        )
+    else:
+        summary, cache_hit, first_token = summarize_document(
+            doc, request.api_key, request.provider, request.summary_type, request.summary_length,
+            request.language,
+            force_refresh=request.force_refresh,
+            notify=job.notify,
+            on_stream=job.consume_stream if request.stream else None,
+            on_split=on_split,
+            backup_key=request.backup_key
+        )
+        result.update(summary=summary, cache_hit=cache_hit, first_token=first_token)
@@ -0,0 +1,202 @@
+# ============================================
+# PROMPT TEMPLATES AND TRANSLATION TABLE
+# ============================================
+# There are only 5 summary types x 3 lengths x 10 languages, so instead of
+# calling GoogleTranslator on every click we keep a translation table in
+# CACHE_DIR/prompt_translations.json. It fills lazily as prompts are used,
+# or all at once with:
+#
+#     python -m zalingo.prompts
+#
+# The table is versioned on the English templates: editing a template
+# throws the old translations away instead of serving stale wording.
+
+import hashlib
+import json
+import sys
+import threading
+import time
+
+from . import metrics, resources, settings
+from .jsonfile import load_json, save_json
+
+summary_prompts = {
+    "Full paper summary": "Summarize this entire academic paper comprehensively. Include the research question, methodology, key findings, and conclusions. Do not include references or citations in the summary.",
+    "Abstract only": "Extract and summarize just the abstract of this paper. Do not include references.",
+    "Introduction + Conclusion": "Summarize only the introduction and conclusion sections. Do not include references.",
+    "Key findings only": "Extract and list the main findings and results. Do not include references.",
+    "Study notes (bullet points)": "Convert this paper into study notes with bullet points. Focus only on the content, not references."
+}
+
+length_map = {
+    "Short": "Write a concise summary in 3-4 sentences.",
+    "Medium": "Write a balanced summary in 1-2 paragraphs.",
+    "Detailed": "Write a comprehensive summary with 3-4 paragraphs."
+}
+
+language_codes = {
+    "English": "en", "Afrikaans": "af", "isiZulu": "zu", "isiXhosa": "xh",
+    "Sepedi (Northern Sotho)": "nso", "Sesotho (Southern Sotho)": "st",
+    "Setswana": "tn", "siSwati": "ss", "Xitsonga": "ts", "Tshivenda": "ve"
+}
+
+# After a failed translation, skip the translator for that language for
+# this long so an outage doesn't add a network timeout to every request
+TRANSLATOR_COOLDOWN = 300
+
+_lock = threading.Lock()
+_table = None
+_translator_down_until = {}         # language code -> time.time() to retry after
+# Codes GoogleTranslator has no language for (Setswana, siSwati and
+# Tshivenda): these always get the fallback prompt
+_unsupported = set()
+
+
+def templates_version():
+    """Hash of the English templates; part of every table entry's validity"""
+    blob = json.dumps([summary_prompts, length_map], sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:12]
+
+
+def base_prompt(summary_type, summary_length):
+    """The English instruction for one summary type and length"""
+    return f"{summary_prompts[summary_type]} {length_map[summary_length]}"
+
+
+def fallback_prompt(summary_type, summary_length, language):
+    """English prompt with an explicit output-language instruction"""
+    return base_prompt(summary_type, summary_length) + f" (Please respond in {language})"
+
+
+@resources.register("translator")
+def _new_translator(code):
+    # deep_translator (and its HTML parser) is only imported once something needs translating
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source='en', target=code), threading.Lock()
+
+
+def _unsupported_language(error):
+    try:
+        from deep_translator.exceptions import LanguageNotSupportedException
+    except ImportError:
+        return False
+    return isinstance(error, LanguageNotSupportedException)
+
+
+def translator_supports(code):
+    """False once GoogleTranslator has rejected language `code`"""
+    return code not in _unsupported
+
+
+def translate(texts, code):
+    """English text (a str, or a list of them) translated into language `code`"""
+    try:
+        translator, lock = resources.shared("translator", code)
+    except Exception as e:
+        if _unsupported_language(e):
+            _unsupported.add(code)
+        raise
+    # GoogleTranslator keeps per-request state on the instance: one call at a time
+    with lock:
+        if isinstance(texts, str):
+            return translator.translate(texts)
+        return translator.translate_batch(texts)
+
+
+def _table_path():
+    return settings.cache_path("prompt_translations.json")
+
+
+def _load_table():
+    global _table
+    if _table is None:
+        data = load_json(_table_path(), {})
+        if data.get("version") != templates_version():
+            data = {"version": templates_version(), "entries": {}}
+        _table = data
+    return _table
+
+
+def _entry_key(summary_type, summary_length, code):
+    return f"{code}|{summary_type}|{summary_length}"
+
+
+def _store(translations):
+    with _lock:
+        table = _load_table()
+        table["entries"].update(translations)
+        save_json(_table_path(), table)
+
+
+def get_prompt(summary_type, summary_length, language):
+    """Return the prompt in `language`, translating (once) if needed"""
+    if language == "English":
+        return base_prompt(summary_type, summary_length)
+
+    code = language_codes[language]
+    key = _entry_key(summary_type, summary_length, code)
+    with _lock:
+        cached = _load_table()["entries"].get(key)
+    metrics.count_cache("prompt", bool(cached))
+    if cached:
+        return cached
+
+    if not translator_supports(code) or time.time() < _translator_down_until.get(code, 0.0):
+        return fallback_prompt(summary_type, summary_length, language)
+
+    try:
+        english = base_prompt(summary_type, summary_length)
+        with metrics.span("prompt_translation", language=language, bytes=len(english)):
+            translated = translate(english, code)
+    except Exception:
+        if translator_supports(code):
+            _translator_down_until[code] = time.time() + TRANSLATOR_COOLDOWN
+        translated = None
+
+    if not translated:
+        # Not stored, so the proper translation is retried later
+        return fallback_prompt(summary_type, summary_length, language)
+
+    _store({key: translated})
+    return translated
+
+
+def warm_prompt_table(languages=None):
+    """Translate every missing prompt, one batch per language.
+
+    Returns the number of new entries. Languages whose batch fails are
+    skipped and can be retried later; languages the translator doesn't
+    have are skipped.
+    """
+    languages = languages or [l for l in language_codes if l != "English"]
+    combos = [(t, l) for t in summary_prompts for l in length_map]
+    filled = 0
+
+    for language in languages:
+        code = language_codes[language]
+        if not translator_supports(code):
+            continue
+        with _lock:
+            entries = _load_table()["entries"]
+            missing = [c for c in combos if _entry_key(c[0], c[1], code) not in entries]
+        if not missing:
+            continue
+
+        try:
+            translated = translate([base_prompt(t, l) for t, l in missing], code)
+        except Exception:
+            continue
+
+        new_entries = {
+            _entry_key(t, l, code): text
+            for (t, l), text in zip(missing, translated) if text
+        }
+        _store(new_entries)
+        filled += len(new_entries)
+
+    return filled
+
+
+if __name__ == "__main__":
+    count = warm_prompt_table(sys.argv[1:] or None)
+    print(f"Added {count} prompt translations to {_table_path()}")
@@ -0,0 +1,476 @@
+# ============================================
+# AI PROVIDER CALLS
+# ============================================
+# Gemini (SDK with REST fallback) and Mistral, blocking and streaming.
+# These are UI-free so the Streamlit app, the batch runner and the CLI can
+# share them: progress and errors are reported through a
+# `notify(level, message)` callback, where level is "success", "info",
+# "warning" or "error". The default just logs.
+#
+# Every call takes an optional `output_tokens`: the answer length to
+# reserve room for. The paper text is packed to what the chosen model can
+# take next to it (see zalingo/budget.py).
+#
+# The public call and stream functions are @scheduled: each waits for a
+# slot for its API key (see zalingo/scheduler.py) before sending anything.
+
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+
+from . import budget, metrics, resources, settings, transport
+from .scheduler import scheduled
+from .hedging import AllCandidatesFailed, Candidate, open_first, stream_text
+from .model_cache import resolve_model, ordered_candidates, remember_model, forget_model
+from .streaming import iter_sse_json
+
+logger = logging.getLogger(__name__)
+
+_LOG_LEVELS = {
+    "success": logging.INFO,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+
+def log_notify(level, message):
+    """Default notifier: send provider messages to the logging module"""
+    logger.log(_LOG_LEVELS.get(level, logging.INFO), message)
+
+
+# ============================================
+# WHICH MODEL ANSWERED
+# ============================================
+# A Gemini call can be answered by any SDK model, any REST endpoint or the
+# Mistral backup. Callers that cache answers need to know which one did.
+# A block only sees the answers given directly inside it: code that
+# collects answers in its own block (e.g. summarize_document) passes the
+# one that counts on with record_answer.
+
+_answers = contextvars.ContextVar("zalingo_answers", default=None)
+
+
+def model_id(provider, model):
+    """"gemini", "models/gemini-2.5-pro" -> "gemini/gemini-2.5-pro" """
+    return f"{provider}/{model.rsplit('/', 1)[-1]}"
+
+
+@contextmanager
+def answered_by():
+    """Collect the model_id of every model that starts answering inside the block.
+
+    Fallbacks are appended in the order they are tried, so the last id is
+    the model that produced the answer.
+    """
+    answers = []
+    token = _answers.set(answers)
+    try:
+        yield answers
+    finally:
+        _answers.reset(token)
+
+
+def record_answer(answer_id):
+    """Tell the enclosing answered_by block that `answer_id` answered
+    (e.g. a summary served from the cache)"""
+    answers = _answers.get()
+    if answers is not None:
+        answers.append(answer_id)
+
+
+def _answering(provider, model):
+    record_answer(model_id(provider, model))
+
+
+# ============================================
+# UPDATED GEMINI API FUNCTIONS WITH 2026 MODEL NAMES
+# ============================================
+
+# Updated model names for 2026 (tried in order, the winner is cached per key)
+GEMINI_SDK_MODELS = [
+    'gemini-2.5-flash',
+    'gemini-2.5-pro',
+    'gemini-3-flash',
+    'gemini-3-pro',
+    'models/gemini-2.5-flash',
+    'models/gemini-2.5-pro'
+]
+
+GEMINI_REST_ENDPOINTS = [
+    "v1beta/models/gemini-2.5-flash",
+    "v1/models/gemini-2.5-flash",
+    "v1beta/models/gemini-2.5-pro",
+    "v1beta/models/gemini-3-flash",
+    "v1beta/models/gemini-3-pro",
+    "v1beta/models/gemini-1.5-flash-002"
+]
+
+_configure_lock = threading.Lock()
+
+@resources.register("gemini-model")
+def _new_gemini_model(api_key, model_name):
+    # The SDK is slow to import, so only Gemini SDK calls pay for it
+    import google.generativeai as genai
+    from google.generativeai import client
+    
+    # configure() is process-wide: bind the model to this key's client now,
+    # not to whichever key happens to be configured at its first call
+    with _configure_lock:
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(model_name)
+        model._client = client.get_default_generative_client()
+    return model
+
+def gemini_model(api_key, model_name):
+    """Shared GenerativeModel for this key and model"""
+    return resources.shared("gemini-model", api_key, model_name)
+
+def probe_gemini_model(api_key, model_name):
+    """Cheap test request; raises if the model can't be used with this key"""
+    with metrics.span("model_probe", provider="gemini", model=model_name):
+        transport.rate_limit("gemini", api_key)
+        gemini_model(api_key, model_name).generate_content("test")
+
+def _sdk_usage(usage_metadata):
+    """(input, output) tokens from the SDK's usage_metadata, or None"""
+    if usage_metadata is None:
+        return None
+    return (getattr(usage_metadata, "prompt_token_count", None),
+            getattr(usage_metadata, "candidates_token_count", None))
+
+def _gemini_usage(event):
+    usage = event.get('usageMetadata')
+    if not usage:
+        return None
+    return usage.get('promptTokenCount'), usage.get('candidatesTokenCount')
+
+def _mistral_usage(event):
+    usage = event.get('usage')
+    if not usage:
+        return None
+    return usage.get('prompt_tokens'), usage.get('completion_tokens')
+
+def _observe_usage(model, sent, span):
+    """Let the token estimates learn from what the provider reported"""
+    if span.get("tokens_in"):
+        budget.observe(model, sent, span["tokens_in"])
+
+def _paper_prompt(prompt, paper_text, model, output_tokens):
+    return f"{prompt}\n\nPAPER TEXT:\n{budget.fit(prompt, paper_text, model, output_tokens)}"
+
+@scheduled("gemini")
+def call_gemini_api(api_key, prompt, paper_text, notify=log_notify, backup_key=None, output_tokens=None):
+    """Call Google's Gemini API with 2026 model names"""
+    if not settings.GEMINI_SDK:
+        return call_gemini_rest_api(api_key, prompt, paper_text, notify, backup_key, output_tokens)
+    
+    try:
+        # Probe the candidates only if we don't already know a working model for this key
+        model_name = resolve_model(
+            "gemini-sdk", api_key, GEMINI_SDK_MODELS,
+            lambda name: probe_gemini_model(api_key, name)
+        )
+        
+        if model_name is None:
+            # If none work, use REST API as fallback
+            notify("warning", "SDK models failed, trying REST API...")
+            return call_gemini_rest_api(api_key, prompt, paper_text, notify, backup_key, output_tokens)
+        
+        notify("success", f"✅ Using model: {model_name}")
+        _answering("gemini", model_name)
+        model = gemini_model(api_key, model_name)
+        
+        # Combine prompt and paper text
+        full_prompt = _paper_prompt(prompt, paper_text, model_name, output_tokens)
+        
+        try:
+            with metrics.span("llm_call", provider="gemini", model=model_name, bytes=len(full_prompt)) as span:
+                transport.rate_limit("gemini", api_key)
+                response = model.generate_content(full_prompt)
+                tokens = _sdk_usage(getattr(response, "usage_metadata", None))
+                if tokens:
+                    span["tokens_in"], span["tokens_out"] = tokens
+            _observe_usage(model_name, full_prompt, span)
+            return response.text
+        except Exception:
+            # Don't keep trusting a model that just failed
+            forget_model("gemini-sdk", api_key)
+            raise
+        
+    except Exception as e:
+        notify("warning", f"SDK Error: {str(e)}. Trying REST API...")
+        return call_gemini_rest_api(api_key, prompt, paper_text, notify, backup_key, output_tokens)
+
+@scheduled("gemini")
+def call_gemini_rest_api(api_key, prompt, paper_text, notify=log_notify, backup_key=None, output_tokens=None):
+    """Fallback: Call Gemini directly via REST API with 2026 model names"""
+    try:
+        return "".join(stream_gemini_rest_api(api_key, prompt, paper_text, notify, backup_key, output_tokens)) or None
+    except Exception as e:
+        notify("error", f"REST API Error: {str(e)}")
+        return None
+
+MISTRAL_MODEL = "mistral-small-latest"  # Free tier model
+
+@scheduled("mistral")
+def call_mistral_api(api_key, prompt, paper_text, notify=log_notify, output_tokens=None):
+    """Call Mistral AI API (FREE - 1B tokens/month)"""
+    try:
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": MISTRAL_MODEL,
+            "messages": [
+                {"role": "system", "content": "You are an expert academic research assistant. Provide summaries without references."},
+                {"role": "user", "content": _paper_prompt(prompt, paper_text, MISTRAL_MODEL, output_tokens)}
+            ],
+            "temperature": 0.3,
+            "max_tokens": budget.max_output(MISTRAL_MODEL, output_tokens)
+        }
+        
+        with metrics.span("llm_call", provider="mistral", model=MISTRAL_MODEL,
+                          bytes=len(data["messages"][1]["content"])) as span:
+            response = transport.post(
+                "mistral",
+                f"{settings.MISTRAL_BASE_URL}/v1/chat/completions",
+                api_key,
+                headers=headers,
+                json=data
+            )
+            if response.status_code == 200:
+                result = response.json()
+                tokens = _mistral_usage(result)
+                if tokens:
+                    span["tokens_in"], span["tokens_out"] = tokens
+        _observe_usage(MISTRAL_MODEL, data["messages"][1]["content"], span)
+        
+        if response.status_code == 200:
+            _answering("mistral", MISTRAL_MODEL)
+            return result['choices'][0]['message']['content']
+        else:
+            notify("error", f"Mistral API Error: {response.status_code} - {response.text}")
+            return None
+    except Exception as e:
+        notify("error", f"Mistral API Error: {str(e)}")
+        return None
+
+# ============================================
+# RACE CANDIDATES
+# ============================================
+# Streaming requests for zalingo.hedging: every Gemini REST endpoint (the
+# one that worked last time for this key first) and optionally Mistral.
+
+def _gemini_event_text(event):
+    for candidate in event.get('candidates', [])[:1]:
+        return "".join(part.get('text', '') for part in candidate.get('content', {}).get('parts', []))
+    return None
+
+def _mistral_event_text(event):
+    for choice in event.get('choices', [])[:1]:
+        return choice.get('delta', {}).get('content')
+    return None
+
+def gemini_rest_candidates(api_key, prompt, paper_text, output_tokens=None):
+    """One streamGenerateContent candidate per REST endpoint.
+
+    The text is packed once, for the endpoint expected to win. No
+    maxOutputTokens is sent: on thinking models it would also cap the
+    thinking, and cut answers short.
+    """
+    endpoints = ordered_candidates("gemini-rest", api_key, GEMINI_REST_ENDPOINTS)
+    data = {
+        "contents": [{
+            "parts": [{"text": _paper_prompt(prompt, paper_text, endpoints[0], output_tokens)}]
+        }]
+    }
+    return [
+        Candidate(
+            name=endpoint,
+            label=endpoint.split('/')[-1],
+            provider="gemini",
+            api_key=api_key,
+            url=f"{settings.GEMINI_BASE_URL}/{endpoint}:streamGenerateContent?alt=sse&key={api_key}",
+            headers={"Content-Type": "application/json"},
+            body=data,
+            extract=_gemini_event_text,
+            usage=_gemini_usage
+        )
+        for endpoint in endpoints
+    ]
+
+def _candidate_text(candidate):
+    """The prompt text a race candidate sends"""
+    if candidate.provider == "mistral":
+        return candidate.body["messages"][1]["content"]
+    return candidate.body["contents"][0]["parts"][0]["text"]
+
+def mistral_candidate(api_key, prompt, paper_text, output_tokens=None):
+    """Mistral's streaming chat completion as a race candidate"""
+    return Candidate(
+        name=MISTRAL_MODEL,
+        label=f"{MISTRAL_MODEL} (backup)",
+        provider="mistral",
+        api_key=api_key,
+        url=f"{settings.MISTRAL_BASE_URL}/v1/chat/completions",
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        },
+        body={
+            "model": MISTRAL_MODEL,
+            "messages": [
+                {"role": "system", "content": "You are an expert academic research assistant. Provide summaries without references."},
+                {"role": "user", "content": _paper_prompt(prompt, paper_text, MISTRAL_MODEL, output_tokens)}
+            ],
+            "temperature": 0.3,
+            "max_tokens": budget.max_output(MISTRAL_MODEL, output_tokens),
+            "stream": True
+        },
+        extract=_mistral_event_text,
+        usage=_mistral_usage
+    )
+
+# ============================================
+# STREAMING VARIANTS
+# ============================================
+# Same fallbacks as the functions above, but yielding text as it arrives.
+# Once any text has been shown we never fall back to another model, since
+# that would start the summary over.
+
+@scheduled("gemini")
+def stream_gemini_api(api_key, prompt, paper_text, notify=log_notify, backup_key=None, output_tokens=None):
+    """Stream from Google's Gemini SDK, falling back to the REST stream"""
+    if not settings.GEMINI_SDK:
+        yield from stream_gemini_rest_api(api_key, prompt, paper_text, notify, backup_key, output_tokens)
+        return
+    
+    emitted = False
+    try:
+        model_name = resolve_model(
+            "gemini-sdk", api_key, GEMINI_SDK_MODELS,
+            lambda name: probe_gemini_model(api_key, name)
+        )
+        
+        if model_name is None:
+            notify("warning", "SDK models failed, trying REST API...")
+            yield from stream_gemini_rest_api(api_key, prompt, paper_text, notify, backup_key, output_tokens)
+            return
+        
+        notify("success", f"✅ Using model: {model_name}")
+        _answering("gemini", model_name)
+        model = gemini_model(api_key, model_name)
+        full_prompt = _paper_prompt(prompt, paper_text, model_name, output_tokens)
+        
+        try:
+            with metrics.span("llm_call", provider="gemini", model=model_name, bytes=len(full_prompt)) as span:
+                transport.rate_limit("gemini", api_key)
+                for chunk in model.generate_content(full_prompt, stream=True):
+                    tokens = _sdk_usage(getattr(chunk, "usage_metadata", None))
+                    if tokens:
+                        span["tokens_in"], span["tokens_out"] = tokens
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunk without text parts (e.g. only safety metadata)
+                        continue
+                    emitted = True
+                    yield text
+            _observe_usage(model_name, full_prompt, span)
+        except Exception:
+            forget_model("gemini-sdk", api_key)
+            raise
+        
+    except Exception as e:
+        if emitted:
+            notify("error", f"Stream interrupted: {str(e)}")
+            return
+        notify("warning", f"SDK Error: {str(e)}. Trying REST API...")
+        yield from stream_gemini_rest_api(api_key, prompt, paper_text, notify, backup_key, output_tokens)
+
+@scheduled("gemini")
+def stream_gemini_rest_api(api_key, prompt, paper_text, notify=log_notify, backup_key=None, output_tokens=None):
+    """Stream from Gemini's REST streamGenerateContent endpoint (SSE).
+
+    The endpoints are raced (see zalingo/hedging.py), with a Mistral
+    backup key, if given, as the last candidate.
+    """
+    candidates = gemini_rest_candidates(api_key, prompt, paper_text, output_tokens)
+    backup_key = backup_key or settings.BACKUP_MISTRAL_KEY
+    if backup_key:
+        candidates.append(mistral_candidate(backup_key, prompt, paper_text, output_tokens))
+    
+    def report(error):
+        if error.status != 404:
+            notify("warning", f"API Error {error.status or str(error.__cause__)} on {error.candidate.label}, trying next...")
+    
+    try:
+        candidate, response = open_first(candidates, on_failure=report)
+    except AllCandidatesFailed:
+        notify("error", "All REST API attempts failed. Please try Mistral AI instead.")
+        return
+    
+    if candidate.provider == "gemini":
+        remember_model("gemini-rest", api_key, candidate.name)
+    notify("success", f"✅ Using model: {candidate.label}")
+    _answering(candidate.provider, candidate.model)
+    
+    try:
+        with metrics.span("llm_call", provider=candidate.provider, model=candidate.label,
+                          bytes=len(prompt) + len(paper_text)) as span:
+            yield from stream_text(candidate, response, span)
+        _observe_usage(candidate.name, _candidate_text(candidate), span)
+    except Exception as e:
+        notify("error", f"Stream interrupted: {str(e)}")
+
+@scheduled("mistral")
+def stream_mistral_api(api_key, prompt, paper_text, notify=log_notify, output_tokens=None):
+    """Stream from Mistral AI's chat completions endpoint (SSE)"""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    data = {
+        "model": MISTRAL_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are an expert academic research assistant. Provide summaries without references."},
+            {"role": "user", "content": _paper_prompt(prompt, paper_text, MISTRAL_MODEL, output_tokens)}
+        ],
+        "temperature": 0.3,
+        "max_tokens": budget.max_output(MISTRAL_MODEL, output_tokens),
+        "stream": True
+    }
+    
+    try:
+        with metrics.span("llm_call", provider="mistral", model=MISTRAL_MODEL,
+                          bytes=len(data["messages"][1]["content"])) as span:
+            response = transport.post(
+                "mistral",
+                f"{settings.MISTRAL_BASE_URL}/v1/chat/completions",
+                api_key,
+                headers=headers,
+                json=data,
+                stream=True
+            )
+            
+            if response.status_code != 200:
+                notify("error", f"Mistral API Error: {response.status_code} - {response.text}")
+                return
+            _answering("mistral", MISTRAL_MODEL)
+            
+            for event in iter_sse_json(response):
+                tokens = _mistral_usage(event)
+                if tokens:
+                    span["tokens_in"], span["tokens_out"] = tokens
+                for choice in event.get('choices', [])[:1]:
+                    content = choice.get('delta', {}).get('content')
+                    if content:
+                        yield content
+        _observe_usage(MISTRAL_MODEL, data["messages"][1]["content"], span)
+    except Exception as e:
+        notify("error", f"Mistral API Error: {str(e)}")
@@ -0,0 +1,52 @@
+# ============================================
+# LONG-LIVED RESOURCES
+# ============================================
+# Objects worth keeping for the life of the process - HTTP sessions,
+# Gemini models bound to a configured client, translators - are built
+# once through `shared(kind, *key)` from a factory registered for `kind`.
+#
+# Outside Streamlit (batch runner, CLI, benchmark) they live in a plain
+# dict. The app calls `use_cache(st.cache_resource)` so they are held in
+# Streamlit's resource cache instead: shared by every session and rerun,
+# and cleared together with the rest of it.
+
+import threading
+
+_factories = {}
+_objects = {}
+_lock = threading.Lock()
+_cached_build = None
+
+
+def register(kind):
+    """Decorator: register the factory that builds resources of `kind`"""
+    def decorator(factory):
+        _factories[kind] = factory
+        return factory
+    return decorator
+
+
+def _build(kind, *key):
+    return _factories[kind](*key)
+
+
+def use_cache(cache_decorator):
+    """Hold resources with a caching decorator (e.g. st.cache_resource) instead of a dict"""
+    global _cached_build
+    _cached_build = cache_decorator(_build)
+
+
+def shared(kind, *key):
+    """The resource of `kind` for `key`, built on first use"""
+    if _cached_build is not None:
+        return _cached_build(kind, *key)
+    with _lock:
+        if (kind, key) not in _objects:
+            _objects[(kind, key)] = _build(kind, *key)
+        return _objects[(kind, key)]
+
+
+def clear():
+    """Drop every resource held in the plain dict"""
+    with _lock:
+        _objects.clear()
@@ -0,0 +1,278 @@
+# ============================================
+# FAIR SCHEDULING OF PROVIDER CALLS PER API KEY
+# ============================================
+# Many students share one deployment, some of them one class key. Every
+# provider call (see the @scheduled functions in zalingo/providers.py)
+# first takes a slot for its (provider, API key):
+#   - at most settings.KEY_CONCURRENCY calls per key are in flight; the
+#     request rate per key is still capped by transport's token bucket
+#   - waiting calls are served by weighted fair queuing across sessions:
+#     each call gets a virtual finish tag (start + cost / weight), so a
+#     session firing off twenty chunk calls can't starve one that sends a
+#     single request
+#   - short requests ("Abstract only", "Short") go in a priority lane
+#     ahead of the fair queue; a normal call that has waited more than
+#     settings.PRIORITY_AGING seconds joins that lane too
+#
+# A call that sends more than one request at a time (the hedged Gemini
+# race, see zalingo/hedging.py) takes an extra slot per additional request
+# with `extra_slot`, and doesn't send it if the key has none free.
+#
+# Who is asking is set once per job with `requester(...)` and travels with
+# the context (into thread pools via metrics.in_context). Its `on_wait`
+# callback gets the queue position and an estimated wait while a call is
+# held back, which the page shows.
+
+import contextvars
+import functools
+import hashlib
+import inspect
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from . import metrics, settings
+
+# How often a waiting call re-reports its position
+WAIT_POLL = 0.5
+
+# Assumed seconds per call until a key has finished one
+DEFAULT_SERVICE_SECONDS = 10.0
+
+# Characters of prompt + paper text counted as one unit of cost
+COST_UNIT_CHARS = 4000
+
+
+@dataclass
+class Requester:
+    session: str = "default"
+    weight: float = 1.0
+    priority: bool = False
+    on_wait: object = None          # on_wait(position, eta_seconds); (None, None) once running
+
+
+@dataclass
+class _Ticket:
+    requester: Requester
+    cost: float
+    start: float
+    finish: float
+    seq: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted: bool = False
+
+    def lane(self, now):
+        if self.requester.priority or now - self.enqueued_at > settings.PRIORITY_AGING:
+            return 0
+        return 1
+
+    def order(self, now):
+        return (self.lane(now), self.finish, self.seq)
+
+
+class _KeyState:
+    def __init__(self):
+        self.active = 0
+        self.waiting = []
+        self.virtual_time = 0.0
+        self.last_finish = {}           # session -> finish tag of its latest call
+        self.service_seconds = DEFAULT_SERVICE_SECONDS
+
+
+_requester = contextvars.ContextVar("zalingo_requester", default=None)
+_holding = contextvars.ContextVar("zalingo_holding_slot", default=False)
+
+
+@contextmanager
+def requester(session="default", weight=1.0, priority=False, on_wait=None):
+    """Provider calls made in this block are scheduled for this session"""
+    token = _requester.set(Requester(session, weight, priority, on_wait))
+    holding = _holding.set(False)
+    try:
+        yield
+    finally:
+        _holding.reset(holding)
+        _requester.reset(token)
+
+
+class Scheduler:
+    """Per-key concurrency limit with weighted fair queuing across sessions"""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.states = {}
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+
+    # ---------- bookkeeping (call with the condition held) ----------
+
+    def _dispatch(self, state):
+        now = time.monotonic()
+        while state.active < self.concurrency and state.waiting:
+            ticket = min(state.waiting, key=lambda t: t.order(now))
+            state.waiting.remove(ticket)
+            state.active += 1
+            state.virtual_time = max(state.virtual_time, ticket.start)
+            ticket.granted = True
+        if not state.waiting and not state.active:
+            # Idle: old finish tags no longer matter
+            state.last_finish.clear()
+            state.virtual_time = 0.0
+        self.condition.notify_all()
+
+    def _position(self, state, ticket):
+        """(1-based place among waiters, estimated seconds until it runs)"""
+        now = time.monotonic()
+        ahead = sum(1 for t in state.waiting if t.order(now) < ticket.order(now))
+        eta = (ahead // self.concurrency + 0.5) * state.service_seconds
+        return ahead + 1, eta
+
+    # ---------- slots ----------
+
+    @contextmanager
+    def slot(self, key, cost=1.0, who=None):
+        """Hold one of `key`'s slots for the duration of the block"""
+        who = who or _requester.get() or Requester()
+        with self.condition:
+            state = self.states.setdefault(key, _KeyState())
+            start = max(state.virtual_time, state.last_finish.get(who.session, 0.0))
+            finish = start + cost / max(who.weight, 0.01)
+            state.last_finish[who.session] = finish
+            ticket = _Ticket(who, cost, start, finish, next(self.counter))
+            state.waiting.append(ticket)
+            self._dispatch(state)
+
+            waited = time.monotonic()
+            while not ticket.granted:
+                if who.on_wait is not None:
+                    who.on_wait(*self._position(state, ticket))
+                self.condition.wait(WAIT_POLL)
+            waited = time.monotonic() - waited
+
+        if who.on_wait is not None and waited:
+            who.on_wait(None, None)
+        metrics.record("queue_wait", waited, provider=key[0], lane=ticket.lane(time.monotonic()))
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.condition:
+                state.active -= 1
+                state.service_seconds = 0.8 * state.service_seconds + 0.2 * (time.monotonic() - started)
+                self._dispatch(state)
+
+    def try_acquire(self, key):
+        """Take a slot of `key` without waiting: True if one was free and nobody is queued"""
+        with self.condition:
+            state = self.states.setdefault(key, _KeyState())
+            if state.waiting or state.active >= self.concurrency:
+                return False
+            state.active += 1
+            return True
+
+    def release(self, key):
+        """Give back a slot taken with try_acquire"""
+        with self.condition:
+            state = self.states[key]
+            state.active -= 1
+            self._dispatch(state)
+
+    def snapshot(self):
+        """{key: (calls in flight, calls waiting)} for keys with any traffic"""
+        with self.condition:
+            return {key: (s.active, len(s.waiting)) for key, s in self.states.items() if s.active or s.waiting}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide Scheduler, or None when scheduling is turned off"""
+    global _scheduler
+    if settings.KEY_CONCURRENCY <= 0:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(settings.KEY_CONCURRENCY)
+        return _scheduler
+
+
+def key_id(provider, api_key):
+    """Scheduling key: the provider plus a hash of the API key"""
+    return provider, hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def extra_slot(provider, api_key):
+    """One more slot for a call that already holds one, if free right now.
+
+    Returns a function that gives it back, or None if the key is busy.
+    """
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return lambda: None
+    key = key_id(provider, api_key)
+    if not scheduler.try_acquire(key):
+        return None
+    return functools.partial(scheduler.release, key)
+
+
+@contextmanager
+def _slot(provider, api_key, prompt, paper_text):
+    """Hold a slot for the key, unless the caller already holds one"""
+    scheduler = get_scheduler()
+    if scheduler is None or _holding.get():
+        # A fallback inside a call that already holds a slot
+        yield
+        return
+    cost = max(1.0, (len(prompt) + len(paper_text)) / COST_UNIT_CHARS)
+    with scheduler.slot(key_id(provider, api_key), cost):
+        yield
+
+
+@contextmanager
+def _marked_holding():
+    """Calls made inside the block are fallbacks of the one holding the slot"""
+    token = _holding.set(True)
+    try:
+        yield
+    finally:
+        _holding.reset(token)
+
+
+def scheduled(provider):
+    """Decorator for `fn(api_key, prompt, paper_text, ...)`: run it in a slot for its key.
+
+    Generator functions hold the slot until the stream is finished or
+    closed. A generator has no context of its own, so the slot is only
+    marked as held while the stream runs, not while it is suspended in
+    the consumer's hands.
+    """
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def stream_wrapper(api_key, prompt, paper_text, *args, **kwargs):
+                with _slot(provider, api_key, prompt, paper_text):
+                    stream = fn(api_key, prompt, paper_text, *args, **kwargs)
+                    try:
+                        while True:
+                            with _marked_holding():
+                                try:
+                                    chunk = next(stream)
+                                except StopIteration:
+                                    return
+                            yield chunk
+                    finally:
+                        with _marked_holding():
+                            stream.close()
+            return stream_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(api_key, prompt, paper_text, *args, **kwargs):
+            with _slot(provider, api_key, prompt, paper_text), _marked_holding():
+                return fn(api_key, prompt, paper_text, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,124 @@
+# ============================================
+# ZALINGO SETTINGS
+# ============================================
+# Runtime knobs shared by the app and its helpers. Every value can be
+# overridden with an environment variable so deployments don't need code
+# changes.
+
+import os
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return float(default)
+
+
+CACHE_DIR = os.environ.get(
+    "ZALINGO_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "zalingo")
+)
+
+# How long a model that answered for an API key is trusted before re-probing
+MODEL_CACHE_TTL = _env_float("ZALINGO_MODEL_CACHE_TTL", 6 * 3600)
+
+
+def cache_path(name):
+    """Return a path inside CACHE_DIR, creating the directory on first use"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+# Upper bound for the persistent summary/document cache before LRU eviction
+SUMMARY_CACHE_MAX_BYTES = int(_env_float("ZALINGO_SUMMARY_CACHE_MB", 200) * 1024 * 1024)
+
+# Map-reduce summarization: how many chunk summaries run at once per paper
+MAP_CONCURRENCY = max(1, int(_env_float("ZALINGO_MAP_CONCURRENCY", 3)))
+
+# Parallel PDF extraction: worker processes, and the page count below which
+# extraction simply runs in-process
+EXTRACTION_WORKERS = max(1, int(_env_float("ZALINGO_EXTRACTION_WORKERS", min(4, os.cpu_count() or 1))))
+PARALLEL_MIN_PAGES = int(_env_float("ZALINGO_PARALLEL_MIN_PAGES", 40))
+
+# Provider HTTP transport
+CONNECT_TIMEOUT = _env_float("ZALINGO_CONNECT_TIMEOUT", 10)
+READ_TIMEOUT = _env_float("ZALINGO_READ_TIMEOUT", 120)
+HTTP_RETRIES = int(_env_float("ZALINGO_HTTP_RETRIES", 3))
+MAX_RETRY_WAIT = _env_float("ZALINGO_MAX_RETRY_WAIT", 60)
+
+# Client-side request budget per API key (documented free-tier limits)
+RATE_LIMITS_PER_MINUTE = {
+    "gemini": _env_float("ZALINGO_GEMINI_RPM", 60),
+    "mistral": _env_float("ZALINGO_MISTRAL_RPM", 60),
+}
+
+# Batch mode: provider calls in flight at once (all still share the
+# per-key rate limit above)
+BATCH_CONCURRENCY = max(1, int(_env_float("ZALINGO_BATCH_CONCURRENCY", 4)))
+
+# Background summary jobs: worker threads, and how long finished jobs are
+# kept so a page rerun can still pick up the result. Jobs waiting for a
+# busy API key park in the scheduler, so there are enough workers that
+# they don't hold up jobs for other keys.
+JOB_WORKERS = max(1, int(_env_float("ZALINGO_JOB_WORKERS", 16)))
+JOB_TTL = _env_float("ZALINGO_JOB_TTL", 3600)
+
+# Hedged Gemini requests: seconds to wait for an answer before also firing
+# the next candidate model, and how long a failing endpoint is skipped
+# (doubling per consecutive failure, up to the maximum)
+HEDGE_DELAY = _env_float("ZALINGO_HEDGE_DELAY", 2.0)
+HEALTH_COOLDOWN = _env_float("ZALINGO_HEALTH_COOLDOWN", 30)
+HEALTH_MAX_COOLDOWN = _env_float("ZALINGO_HEALTH_MAX_COOLDOWN", 600)
+
+# Optional Mistral key raced as a last resort when Gemini is down (the app
+# also takes one in the sidebar)
+BACKUP_MISTRAL_KEY = os.environ.get("ZALINGO_BACKUP_MISTRAL_KEY") or None
+
+# Pipeline metrics: append every summary's trace to CACHE_DIR/traces.jsonl
+# and keep CACHE_DIR/metrics.prom up to date (set to 0 to disable)
+METRICS_EXPORT = os.environ.get("ZALINGO_METRICS", "1") != "0"
+
+# Size at which traces.jsonl is rotated to traces.jsonl.1 (the previous
+# .1 is dropped), so the trace log stays under twice this
+TRACES_MAX_BYTES = int(_env_float("ZALINGO_TRACES_MB", 20) * 1024 * 1024)
+
+# Provider endpoints. Point these at a local stand-in (see bench/) to run
+# the pipeline offline; the Gemini SDK can't be redirected, so it is
+# skipped (straight to REST) whenever ZALINGO_GEMINI_SDK=0.
+GEMINI_BASE_URL = os.environ.get("ZALINGO_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+MISTRAL_BASE_URL = os.environ.get("ZALINGO_MISTRAL_BASE_URL", "https://api.mistral.ai").rstrip("/")
+GEMINI_SDK = os.environ.get("ZALINGO_GEMINI_SDK", "1") != "0"
+
+# Uploads at least this big are spooled to a temp file and memory-mapped
+# instead of being kept in memory
+SPOOL_THRESHOLD = int(_env_float("ZALINGO_SPOOL_THRESHOLD_MB", 8) * 1024 * 1024)
+
+# Peak memory (address space) allowed to each extraction worker process.
+# Spooled uploads are always extracted there, so one huge scanned PDF fails
+# its own job instead of taking the app down. 0 disables the cap.
+JOB_MEMORY_BUDGET = int(_env_float("ZALINGO_JOB_MEMORY_MB", 1024) * 1024 * 1024)
+
+# OCR for scanned pages (needs pytesseract, pypdfium2 and the tesseract
+# program): "auto" uses it when installed, "0" turns it off. Languages use
+# Tesseract's codes, e.g. "eng+afr".
+OCR_MODE = os.environ.get("ZALINGO_OCR", "auto")
+OCR_LANGUAGES = os.environ.get("ZALINGO_OCR_LANGUAGES", "eng")
+OCR_DPI = _env_float("ZALINGO_OCR_DPI", 200)
+
+# Most prompt + paper tokens sent in one provider call, even to models with
+# bigger context windows (see zalingo/budget.py); keeps a single request
+# well inside the free tiers' tokens-per-minute limits
+MAX_INPUT_TOKENS = int(_env_float("ZALINGO_MAX_INPUT_TOKENS", 100_000))
+
+# Fair scheduling of provider calls (zalingo/scheduler.py): calls in flight
+# at once per API key (0 turns the scheduler off), seconds a normal call
+# waits before it joins the priority lane for short requests, and the
+# weight of batch runs against interactive sessions
+KEY_CONCURRENCY = int(_env_float("ZALINGO_KEY_CONCURRENCY", 2))
+PRIORITY_AGING = _env_float("ZALINGO_PRIORITY_AGING", 60)
+BATCH_WEIGHT = _env_float("ZALINGO_BATCH_WEIGHT", 0.5)
+
+# Near-duplicate papers (zalingo/near_duplicates.py): estimated share of
+# word 5-grams two copies must have in common for one to reuse the other's
+# summaries and chunk notes (0 turns the lookup off)
+NEAR_DUPLICATE_THRESHOLD = _env_float("ZALINGO_NEAR_DUPLICATE_THRESHOLD", 0.85)
@@ -0,0 +1,119 @@
+# ============================================
+# UPLOAD SPOOLING
+# ============================================
+# Large uploads (settings.SPOOL_THRESHOLD and up) are copied block by
+# block to a temp file in CACHE_DIR/spool and passed around as a path from
+# then on:
+#   - PyPDF2 reads it through a read-only mmap, so the OS pages the PDF in
+#     and out instead of the Python heap holding another copy
+#   - pdfplumber and the extraction workers open the path themselves, so
+#     the PDF is never pickled to the process pool
+# Small uploads stay in memory as bytes, which is cheaper for them. Temp
+# files are removed when the job is done; leftovers from a crash are swept
+# up by the next spool.
+
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from . import settings
+
+BLOCK_SIZE = 1024 * 1024
+
+# Spool files older than this are leftovers from a crashed process
+STALE_SECONDS = 24 * 3600
+
+
+def upload_size(fileobj):
+    """Size of a seekable upload, without reading it"""
+    if hasattr(fileobj, "getbuffer"):
+        return fileobj.getbuffer().nbytes
+    position = fileobj.tell()
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(position)
+    return size
+
+
+def upload_digest(fileobj):
+    """file_digest of an upload, hashed in blocks instead of one big copy"""
+    if hasattr(fileobj, "getbuffer"):
+        return hashlib.sha256(fileobj.getbuffer()).hexdigest()
+    digest = hashlib.sha256()
+    position = fileobj.tell()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(BLOCK_SIZE), b""):
+        digest.update(block)
+    fileobj.seek(position)
+    return digest.hexdigest()
+
+
+def path_digest(path):
+    """file_digest of a file on disk, hashed in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _spool_dir():
+    directory = settings.cache_path("spool")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _sweep(directory):
+    cutoff = time.time() - STALE_SECONDS
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def spool(fileobj):
+    """Copy an upload to a new temp file and return its path"""
+    directory = _spool_dir()
+    _sweep(directory)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            fileobj.seek(0)
+            shutil.copyfileobj(fileobj, out, BLOCK_SIZE)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+@contextmanager
+def spooled(fileobj):
+    """Yield an upload as bytes (small) or a temp file path (large).
+
+    The temp file, if any, is removed when the block exits.
+    """
+    if upload_size(fileobj) < settings.SPOOL_THRESHOLD:
+        fileobj.seek(0)
+        yield fileobj.read()
+        return
+
+    path = spool(fileobj)
+    try:
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def open_mmap(path):
+    """Read-only memory map of a file (PyPDF2 accepts it as a stream)"""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
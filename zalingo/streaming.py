@@ -0,0 +1,53 @@
+# ============================================
+# STREAMED RESPONSES
+# ============================================
+# Helpers for consuming token streams: server-sent events from the Gemini
+# REST (streamGenerateContent?alt=sse) and Mistral (stream: true) APIs,
+# and a wrapper that assembles the full text and measures
+# time-to-first-token for any iterator of text chunks.
+
+import json
+import time
+
+
+def iter_sse_json(response):
+    """Yield the JSON payload of every `data:` event in a streamed response"""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            return
+        try:
+            yield json.loads(payload)
+        except ValueError:
+            continue
+
+
+class TimedStream:
+    """Pass text chunks through while recording timing and the full text.
+
+    After iteration, `text` holds everything that was streamed and
+    `first_token_seconds` the delay before the first non-empty chunk.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.parts = []
+        self.first_token_seconds = None
+        self.total_seconds = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            if self.first_token_seconds is None:
+                self.first_token_seconds = time.perf_counter() - started
+            self.parts.append(chunk)
+            yield chunk
+        self.total_seconds = time.perf_counter() - started
+
+    @property
+    def text(self):
+        return "".join(self.parts)
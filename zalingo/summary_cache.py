@@ -0,0 +1,169 @@
+# ============================================
+# PERSISTENT SUMMARY CACHE
+# ============================================
+# Content-addressed SQLite store (CACHE_DIR/summaries.sqlite3) for
+# finished summaries and for the text extracted from uploaded PDFs.
+# Summaries are keyed on a hash of the normalized paper text plus every
+# setting that changes the output, so the same paper summarized the same
+# way is never paid for twice. The file is kept under
+# settings.SUMMARY_CACHE_MAX_BYTES by evicting least recently used rows
+# (except PINNED_KINDS, which are too expensive to ever recompute).
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from . import settings
+
+# OCR text: a few KB per page, but minutes of CPU to recreate
+PINNED_KINDS = ("ocr",)
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(
+            settings.cache_path("summaries.sqlite3"),
+            timeout=10,
+            check_same_thread=False
+        )
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)")
+        _conn.commit()
+    return _conn
+
+
+# ============================================
+# KEYS
+# ============================================
+
+def normalize_text(text):
+    """Collapse whitespace so re-extractions of the same PDF hash identically"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_digest(text):
+    """Stable hash of the normalized paper text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def file_digest(data):
+    """Hash of the raw uploaded bytes (used to skip re-extraction)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def summary_key(paper_digest, summary_type, summary_length, language, provider):
+    """Cache key for one summary of one paper with one set of options"""
+    parts = [paper_digest, summary_type, summary_length, language, provider]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+# ============================================
+# GENERIC GET / PUT
+# ============================================
+
+def get(kind, key):
+    """Return the cached value or None, refreshing its LRU timestamp"""
+    with _lock:
+        try:
+            conn = _connect()
+            row = conn.execute(
+                "SELECT value FROM entries WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE kind = ? AND key = ?",
+                (time.time(), kind, key)
+            )
+            conn.commit()
+            return row[0]
+        except sqlite3.Error:
+            return None
+
+
+def put(kind, key, value):
+    """Store a value, then evict old rows if the cache is over budget"""
+    now = time.time()
+    size = len(value.encode("utf-8"))
+    with _lock:
+        try:
+            conn = _connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, key, value, size, now, now)
+            )
+            _evict(conn)
+            conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+def delete(kind, key):
+    with _lock:
+        try:
+            conn = _connect()
+            conn.execute("DELETE FROM entries WHERE kind = ? AND key = ?", (kind, key))
+            conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+def _evict(conn):
+    limit = settings.SUMMARY_CACHE_MAX_BYTES
+    pinned = ", ".join("?" for _ in PINNED_KINDS)
+    total = conn.execute(
+        f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE kind NOT IN ({pinned})", PINNED_KINDS
+    ).fetchone()[0]
+    if total <= limit:
+        return
+    # Trim to 90% so we don't evict again on the very next insert
+    target = int(limit * 0.9)
+    rows = conn.execute(
+        f"SELECT kind, key, size FROM entries WHERE kind NOT IN ({pinned}) ORDER BY accessed_at",
+        PINNED_KINDS
+    ).fetchall()
+    for kind, key, size in rows:
+        if total <= target:
+            break
+        conn.execute("DELETE FROM entries WHERE kind = ? AND key = ?", (kind, key))
+        total -= size
+
+
+# ============================================
+# SUMMARIES AND DOCUMENTS
+# ============================================
+
+def get_summary(key):
+    return get("summary", key)
+
+
+def put_summary(key, summary):
+    put("summary", key, summary)
+
+
+def get_document(digest):
+    """Page texts previously extracted from the PDF with this file digest"""
+    value = get("pages", digest)
+    return json.loads(value) if value else None
+
+
+def put_document(digest, pages):
+    put("pages", digest, json.dumps(pages, ensure_ascii=False))
@@ -0,0 +1,148 @@
+# ============================================
+# PROVIDER HTTP TRANSPORT
+# ============================================
+# One place for every HTTP call to Gemini and Mistral:
+#   - a pooled requests.Session per provider (a shared resource, see
+#     zalingo/resources.py), so the REST fallback loop and concurrent
+#     chunk calls reuse keep-alive connections
+#   - connect/read timeouts on every request
+#   - retries on 429/5xx and connection errors with exponential backoff +
+#     jitter, honouring the server's Retry-After header
+#   - a client-side token bucket per (provider, API key) matching the
+#     free-tier request limits, so concurrent users sharing a key queue up
+#     locally instead of hammering the API into throttling
+
+import email.utils
+import hashlib
+import random
+import threading
+import time
+
+from . import metrics, resources, settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Take one token, sleeping until one is available"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+@resources.register("http-session")
+def _new_session(provider):
+    # requests is imported on first use: the app shouldn't pay for it at startup
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(provider):
+    """Shared keep-alive session for `provider`"""
+    return resources.shared("http-session", provider)
+
+
+def _bucket(provider, api_key):
+    key = (provider, hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16])
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            per_minute = settings.RATE_LIMITS_PER_MINUTE.get(provider, 60)
+            # Allow a short burst of a few seconds' worth of requests
+            bucket = TokenBucket(per_minute / 60.0, max(1.0, per_minute / 12.0))
+            _buckets[key] = bucket
+        return bucket
+
+
+def rate_limit(provider, api_key):
+    """Wait for this key's request budget (for calls made outside `post`, e.g. the SDK)"""
+    _bucket(provider, api_key).acquire()
+
+
+def retry_after_seconds(response):
+    """Parse Retry-After (seconds or HTTP date); None if absent/invalid"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_seconds(attempt, retry_after=None):
+    """Delay before retry number `attempt` (0-based)"""
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, 0.5)
+    else:
+        # Full jitter: spread clients out instead of retrying in lockstep
+        delay = random.uniform(0, BACKOFF_BASE * (2 ** attempt))
+    return min(delay, settings.MAX_RETRY_WAIT)
+
+
+def post(provider, url, api_key=None, retries=None, **kwargs):
+    """POST through the provider's pooled session with rate limiting and retries.
+
+    Returns the last response (which may still be an error status once
+    retries are exhausted); connection errors are re-raised after the
+    final attempt.
+    """
+    import requests
+
+    retries = settings.HTTP_RETRIES if retries is None else retries
+    kwargs.setdefault("timeout", (settings.CONNECT_TIMEOUT, settings.READ_TIMEOUT))
+    session = get_session(provider)
+
+    for attempt in range(retries + 1):
+        rate_limit(provider, api_key)
+        try:
+            response = session.post(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            metrics.count_retry(provider)
+            time.sleep(backoff_seconds(attempt))
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+
+        wait = backoff_seconds(attempt, retry_after_seconds(response))
+        response.close()
+        metrics.count_retry(provider)
+        time.sleep(wait)